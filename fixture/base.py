@@ -4,7 +4,7 @@
 The more useful bits are in :mod:`fixture.loadable`
 
 """
-import sys, traceback
+import sys, traceback, threading, Queue
 try:
     from functools import wraps
 except ImportError:
@@ -18,7 +18,7 @@ except ImportError:
             return new_f
         return wrap_with_f
         
-from fixture.dataset import SuperSet
+from fixture.dataset import SuperSet, dataset_registry
 from compiler.consts import CO_GENERATOR
 
 def is_generator(func):
@@ -27,18 +27,87 @@ def is_generator(func):
     except AttributeError:
         return False
 
+class FixtureTask(object):
+    """Loads or unloads data in a background thread.
+    
+    Returned by :meth:`FixtureData.setup_in_background` and 
+    :meth:`FixtureData.teardown_in_background` so that the calling thread, 
+    i.e. one running an event loop, is not blocked.  callback, if given, is 
+    called with the task from the background thread once it is done.  An 
+    event loop would typically hand the result back to its own thread from 
+    there.
+    
+    The background thread shares the DataSet instances of the calling 
+    thread, see :meth:`DataSet.shared_instance <fixture.dataset.DataSet.shared_instance>`.
+    """
+    def __init__(self, routine, callback=None):
+        self.routine = routine
+        self.callback = callback
+        self.exc_info = None
+        self.finished = threading.Event()
+        self.registry = dataset_registry.current()
+    
+    def run(self):
+        """call the routine in the current thread, then the callback"""
+        dataset_registry.activate(self.registry)
+        try:
+            try:
+                self.routine()
+            except:
+                self.exc_info = sys.exc_info()
+        finally:
+            self.finished.set()
+            if self.callback:
+                self.callback(self)
+    
+    def done(self):
+        """True if the data was loaded or unloaded, or if that failed"""
+        return self.finished.isSet()
+    
+    def wait(self, timeout=None):
+        """wait until the task is done, for at most timeout seconds.
+        
+        Returns False if the task is not done yet and raises the exception 
+        of a failed task.
+        """
+        self.finished.wait(timeout)
+        if not self.done():
+            return False
+        if self.exc_info:
+            etype, val, tb = self.exc_info
+            raise etype, val, tb
+        return True
+
 class FixtureData(object):
     """
     Loads one or more DataSet objects and provides an interface into that 
     data.
     
     Typically this is attached to a concrete Fixture class and constructed by ``data = fixture.data(...)``
+    
+    Data can also be loaded once for a whole scope, such as a module or a 
+    class, with :meth:`setup_scope`.  Each :meth:`setup` / :meth:`teardown` 
+    in between then only begins and rolls back a savepoint::
+    
+        data = fixture.data(EmployeeData)
+        
+        def setup_module():
+            data.setup_scope()
+        
+        def teardown_module():
+            data.teardown_scope()
+    
     """
     def __init__(self, datasets, dataclass, loader):
         self.datasets = datasets
         self.dataclass = dataclass
         self.loader = loader
         self.data = None # instance of dataclass
+        self.scoped = False
+        # the thread that runs every FixtureTask of this object :
+        self.tasks = Queue.Queue()
+        self.task_thread = None
+        self.task_lock = threading.Lock()
 
     def __enter__(self):
         """enter a with statement block.
@@ -64,15 +133,103 @@ class FixtureData(object):
         return self.data[name]
 
     def setup(self):
-        """load all datasets, populating self.data."""
+        """load all datasets, populating self.data.
+        
+        Within a scope this only begins a savepoint.
+        """
+        if self.scoped:
+            self.loader.begin_savepoint()
+            return
         self.data = self.dataclass(*[
                     ds.shared_instance( default_refclass=self.dataclass ) \
                         for ds in iter(self.datasets)])
         self.loader.load(self.data)
 
     def teardown(self):
-        """unload all datasets."""
+        """unload all datasets.
+        
+        Within a scope this only rolls back to the savepoint begun by setup.
+        """
+        if self.scoped:
+            self.loader.rollback_savepoint()
+            return
         self.loader.unload()
+    
+    def setup_scope(self):
+        """load all datasets once for every setup until :meth:`teardown_scope`
+        
+        The loader must support savepoints, see 
+        :meth:`DBLoadableFixture.begin_savepoint <fixture.loadable.loadable.DBLoadableFixture.begin_savepoint>`.  
+        With SQLite, :class:`SQLAlchemyFixture <fixture.loadable.sqlalchemy_loadable.SQLAlchemyFixture>` 
+        requires an engine created with 
+        ``connect_args={'isolation_level': None}``, see 
+        :meth:`SQLAlchemyFixture.create_savepoint <fixture.loadable.sqlalchemy_loadable.SQLAlchemyFixture.create_savepoint>`
+        """
+        if not hasattr(self.loader, 'begin_savepoint'):
+            raise NotImplementedError(
+                "%s cannot roll back to a savepoint" % self.loader)
+        self.setup()
+        self.scoped = True
+    
+    def teardown_scope(self):
+        """unload all datasets loaded by :meth:`setup_scope`"""
+        self.scoped = False
+        self.teardown()
+    
+    def setup_in_background(self, callback=None):
+        """call :meth:`setup` in a background thread and return a 
+        :class:`FixtureTask`
+        
+        Nothing else should be done with this object or its loader until the 
+        task is done.  All tasks of this object run in the same thread, one 
+        after the other, until a teardown outside of a scope.  The loader 
+        may keep a connection created in that thread, which not all 
+        databases allow to use from another thread (i.e. SQLite), so data 
+        loaded in the background should also be torn down with 
+        :meth:`teardown_in_background`.  The stored objects are fetched 
+        before the task is done so that they can be read from any thread, see 
+        :meth:`LoadableFixture.fetch_stored_objects <fixture.loadable.loadable.LoadableFixture.fetch_stored_objects>`.
+        """
+        def setup():
+            self.setup()
+            if hasattr(self.loader, 'fetch_stored_objects'):
+                self.loader.fetch_stored_objects()
+        return self._run_in_background(setup, callback)
+    
+    def teardown_in_background(self, callback=None):
+        """call :meth:`teardown` in the thread of :meth:`setup_in_background` 
+        and return a :class:`FixtureTask`
+        """
+        return self._run_in_background(self.teardown, callback, 
+                                       last=not self.scoped)
+    
+    def _run_in_background(self, routine, callback, last=False):
+        task = FixtureTask(routine, callback=callback)
+        self.task_lock.acquire()
+        try:
+            self.tasks.put((task, last))
+            if self.task_thread is None:
+                self.task_thread = threading.Thread(target=self._run_tasks)
+                self.task_thread.setDaemon(True)
+                self.task_thread.start()
+        finally:
+            self.task_lock.release()
+        return task
+    
+    def _run_tasks(self):
+        while True:
+            task, last = self.tasks.get()
+            task.run()
+            if not last:
+                continue
+            self.task_lock.acquire()
+            try:
+                # nothing is loaded anymore, unless a task was just added :
+                if self.tasks.empty():
+                    self.task_thread = None
+                    return
+            finally:
+                self.task_lock.release()
 
 class Fixture(object):
     """An environment for loading data.
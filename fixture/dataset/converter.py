@@ -87,14 +87,16 @@ def dataset_to_json(dataset, fp=None, default=default_json_converter, wrap=None)
         raise TypeError("First argument must be a class or instance of a DataSet")
     objects = []
     for name, row in _obj_items(dataset):
-        try:
-            if not issubclass(row, DataRow):
+        if not isinstance(row, DataRow):
+            try:
+                if not issubclass(row, DataRow):
+                    continue
+            except TypeError:
                 continue
-        except TypeError:
-            continue
         row_dict = {}
-        for col, val in _obj_items(row):
-            if col=='_reserved_attr' or callable(val):
+        for col in row.columns():
+            val = getattr(row, col)
+            if callable(val):
                 continue
             row_dict[col] = val
         objects.append(row_dict)
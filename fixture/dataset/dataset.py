@@ -6,8 +6,14 @@ few variations on it: :class:`SuperSet` and :class:`MergedSuperSet`
 
 """
 
-import sys, types
-from fixture.util import ObjRegistry
+import sys, types, hashlib
+from array import array
+from fixture.util import ObjRegistry, ThreadLocalRegistry
+numpy = None
+try:
+    import numpy
+except ImportError:
+    pass
 
 class DataContainer(object):
     """
@@ -32,7 +38,7 @@ class DataContainer(object):
     
     def __contains__(self, name):
         """True if name is a known key"""
-        return name in self.meta.keys
+        return name in self.meta.data
     
     def __getitem__(self, key):
         """self['foo'] returns self.meta.data['foo']"""
@@ -129,7 +135,6 @@ class Ref(object):
             
     def __init__(self, dataset_class, row):
         self.dataset_class = dataset_class
-        self.dataset_obj = None
         self.row = row
         # i.e. the name of the row class...
         self.key = self.row.__name__
@@ -142,6 +147,19 @@ class Ref(object):
         return "<%s to %s.%s at %s>" % (
             self.__class__.__name__, self.dataset_class.__name__, 
             self.row.__name__, hex(id(self)))
+    
+    def _get_dataset_obj(self):
+        return dataset_registry.loaded.get(self.dataset_class)
+    
+    def _set_dataset_obj(self, dataset_obj):
+        dataset_registry.loaded[self.dataset_class] = dataset_obj
+    
+    dataset_obj = property(_get_dataset_obj, _set_dataset_obj, doc="""
+        The loaded instance of dataset_class that values are read from.
+        
+        This is kept in the :class:`DataSetRegistry` of the current thread 
+        so that threads loading the same DataSet classes do not read each 
+        other's stored objects.""")
 
 def is_row_class(attr):
     attr_type = type(attr)
@@ -171,6 +189,20 @@ class DataType(type):
                 cls.decorate_row(attr, name, bases, cls_attr)
                 
         del cls_attr['_primary_key']
+        cls.compile_rows()
+    
+    def compile_rows(cls, refresh=False):
+        """Returns the :class:`RowPlan` of this class.
+        
+        The plan is compiled when the class is created and again once the 
+        class, a DataSet class it inherits from or one of their rows has 
+        changed (see :meth:`RowPlan.is_current`), or when refresh is True.
+        """
+        plan = cls.__dict__.get('_row_plan')
+        if plan is None or refresh or not plan.is_current(cls):
+            plan = RowPlan(cls)
+            type.__setattr__(cls, '_row_plan', plan)
+        return plan
     
     def decorate_row(cls, row, name, bases, cls_attr):
         """Each row (an inner class) assigned to a :class:`DataSet` will be customized after it is created.
@@ -263,7 +295,11 @@ class DataRow(object):
     """
     a DataSet row, values accessible by attibute or key.
     """
+    __slots__ = ('_dataset', '_key')
     _reserved_attr = ('columns',)
+    # set on the row classes created by a DataSet (see RowPlan) :
+    _columns = None
+    _ref_columns = None
     
     def __init__(self, dataset):
         object.__setattr__(self, '_dataset', dataset)
@@ -291,11 +327,228 @@ class DataRow(object):
         """Classmethod that yields all attribute names (except reserved attributes) 
         in alphabetical order
         """
+        if self._columns is not None:
+            for k in self._columns:
+                yield k
+            return
         for k in dir(self):
             if k.startswith('_') or k in self._reserved_attr:
                 continue
             yield k
 
+class RowLayout(object):
+    """The column names shared by the :class:`TupleRow` objects of a DataSet."""
+    __slots__ = ('columns', 'index')
+    
+    def __init__(self, columns):
+        self.columns = tuple(columns)
+        self.index = dict([(name, i) for i, name in enumerate(self.columns)])
+
+class TupleRow(DataRow):
+    """A row declared by ``DataSet.data()``, stored as a tuple of values.
+    
+    Unlike the class created for each row of a class-style :class:`DataSet`, 
+    a TupleRow is a small instance that shares its :class:`RowLayout` with 
+    all rows having the same columns.  Values are accessible by attribute or 
+    key and undefined attributes are fetched from the stored object once the 
+    row has been loaded, like any :class:`DataRow`.
+    """
+    __slots__ = ('_layout', '_values')
+    _reserved_attr = DataRow._reserved_attr + ('ref',)
+    
+    def __init__(self, dataset, key, layout, values):
+        object.__setattr__(self, '_dataset', dataset)
+        object.__setattr__(self, '_key', key)
+        object.__setattr__(self, '_layout', layout)
+        object.__setattr__(self, '_values', tuple(values))
+    
+    def __repr__(self):
+        return "<%s %s of %s at %s>" % (
+            self.__class__.__name__, self._key, 
+            self._dataset.__class__.__name__, hex(id(self)))
+    
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            return object.__getattribute__(self, name)
+        try:
+            val = self._values[self._layout.index[name]]
+        except KeyError:
+            return _loaded_attr(self, name)
+        if isinstance(val, Ref.Value):
+            return val.__get__(self, self.__class__)
+        return val
+    
+    def __setattr__(self, name, value):
+        if name not in self._layout.index:
+            raise AttributeError(
+                "cannot set '%s', %s has no such column" % (name, self))
+        values = list(self._values)
+        values[self._layout.index[name]] = value
+        object.__setattr__(self, '_values', tuple(values))
+    
+    __name__ = property(lambda self: self._key, 
+                        doc="the key of this row, like the name of a row class")
+    
+    def columns(self):
+        """yields all column names in alphabetical order"""
+        return iter(self._layout.columns)
+    
+    def ref(self):
+        """Returns a :class:`Ref` to this row"""
+        return Ref(self._dataset.__class__, self)
+    ref = property(ref)
+
+def declared_value(row, name):
+    """Returns the value of column name as it was declared in row.
+    
+    Refs of a :class:`TupleRow` are not resolved.
+    """
+    if isinstance(row, TupleRow):
+        return row._values[row._layout.index[name]]
+    return getattr(row, name)
+
+def referenced_classes(col_val):
+    """Returns the DataSet classes referenced by a column value.
+    
+    Raises TypeError for a multi-value column that contains values other than 
+    rows or simple types
+    """
+    if type(col_val) in (types.ListType, types.TupleType, set):
+        classes = []
+        for c in col_val:
+            if is_rowlike(c):
+                classes.append(c._dataset)
+            # NOP for Google Datastore (String)ListProperty
+            # could definitely break any other storage mediums
+            # ListProperty supports quite a few more types than these
+            # see appengine.ext.db._ALLOWED_PROPERTY_TYPES
+            elif type(c) in (types.StringType, types.UnicodeType, types.BooleanType,
+                             types.FloatType, types.IntType):
+                 continue
+            else:
+                raise TypeError(
+                    "multi-value columns can only contain "
+                    "rowlike objects, not %s of type %s" % (
+                                    col_val, type(col_val)))
+        return classes
+    elif is_rowlike(col_val):
+        return [col_val._dataset]
+    elif isinstance(col_val, Ref.Value):
+        return [col_val.ref.dataset_class]
+    return []
+
+class RowPlan(object):
+    """The rows of a :class:`DataSet` class, compiled once by :class:`DataType`.
+    
+    ``rows``
+        a tuple of (key, row class, column names, reference columns) in 
+        alphabetical order of keys.  Reference columns are the names of 
+        multi-value columns and of columns holding rows or :class:`RefValue` 
+        objects
+    
+    ``references``
+        the DataSet classes referenced by any column, in discovery order
+    
+    The attributes of the class and of its rows are remembered so that a 
+    plan that no longer matches them is compiled again, see 
+    :meth:`is_current`.
+    """
+    def __init__(self, dataset_class):
+        self._state = _class_state(dataset_class)
+        rows = []
+        references = []
+        for key in dir(dataset_class):
+            if key.startswith('_'):
+                continue
+            row_class = getattr(dataset_class, key)
+            if not is_row_class(row_class):
+                continue
+            columns = []
+            ref_columns = []
+            for col_name in dir(row_class):
+                if col_name.startswith('_'):
+                    continue
+                col_val = getattr(row_class, col_name)
+                if isinstance(col_val, Ref):
+                    # the .ref attribute
+                    continue
+                columns.append(col_name)
+                classes = referenced_classes(col_val)
+                if classes or type(col_val) in (types.ListType, 
+                                                types.TupleType, set):
+                    ref_columns.append(col_name)
+                for ref_class in classes:
+                    if ref_class not in references:
+                        references.append(ref_class)
+            rows.append((key, row_class, tuple(columns), tuple(ref_columns)))
+        self.rows = tuple(rows)
+        self.references = tuple(references)
+        self._compiled = dict([(key, (columns, ref_columns)) 
+                            for key, row_class, columns, ref_columns in rows])
+    
+    def __repr__(self):
+        return "<%s with keys %s>" % (
+            self.__class__.__name__, [row[0] for row in self.rows])
+    
+    def is_current(self, dataset_class):
+        """True if no attribute of dataset_class, of the DataSet classes it 
+        inherits from or of their inner classes (rows and ``Meta``) was set, 
+        replaced or deleted since this plan was compiled.
+        
+        Only the ``__dict__`` of each class is compared, which is much 
+        cheaper than compiling the plan again.
+        """
+        state = _class_state(dataset_class)
+        if len(state) != len(self._state):
+            return False
+        for (klass, attrs), (compiled_klass, compiled_attrs) in zip(
+                                                        state, self._state):
+            if klass is not compiled_klass or len(attrs) != len(compiled_attrs):
+                return False
+            for name, value in attrs.iteritems():
+                if compiled_attrs.get(name, _missing) is not value:
+                    return False
+        return True
+    
+    def reference_columns(self, key, columns):
+        """Returns the reference columns of the row at key.
+        
+        Returns None if the row at key does not have these columns (i.e. it 
+        was created by an overridden ``data()`` method)
+        """
+        compiled = self._compiled.get(key)
+        if compiled is None or compiled[0] != columns:
+            return None
+        return compiled[1]
+
+_missing = object()
+# attributes of a DataSet class set when it is compiled, not declared :
+_compiled_attrs = ('_row_plan', '_fingerprint')
+
+def _class_state(dataset_class):
+    """(class, attributes) of dataset_class, the DataSet classes it inherits 
+    from and the classes declared in them, along with their base classes.
+    """
+    state = []
+    seen = set()
+    for ds_class in dataset_class.__mro__:
+        if not isinstance(ds_class, DataType):
+            continue
+        attrs = dict(ds_class.__dict__)
+        for name in _compiled_attrs:
+            attrs.pop(name, None)
+        state.append((ds_class, attrs))
+        inner = [v for v in attrs.itervalues() 
+                    if type(v) in (types.ClassType, type)]
+        while inner:
+            klass = inner.pop()
+            if klass is object or id(klass) in seen:
+                continue
+            seen.add(id(klass))
+            state.append((klass, dict(klass.__dict__)))
+            inner.extend(klass.__bases__)
+    return state
+
 class DataSetStore(list):
     """keeps track of actual objects stored in a dataset."""
     def __init__(self, dataset):
@@ -328,7 +581,24 @@ class DataSetStore(list):
         pos = len(self)-1
         self._ds_key_map[key] = pos
 
-dataset_registry = ObjRegistry()
+class DataSetRegistry(ObjRegistry):
+    """Registers the shared instance of each DataSet class.
+    
+    ``loaded`` maps DataSet classes to the loaded instance that their 
+    :class:`Ref` values are read from.
+    """
+    def __init__(self):
+        ObjRegistry.__init__(self)
+        self.loaded = {}
+    
+    def clear(self):
+        """clear shared and loaded instances"""
+        ObjRegistry.clear(self)
+        self.loaded = {}
+
+# each thread has its own shared DataSet instances, so that threads can load 
+# the same DataSet classes at once :
+dataset_registry = ThreadLocalRegistry(DataSetRegistry)
 
 class DataSetMeta(DataContainer.Meta):
     """
@@ -430,7 +700,9 @@ class DataSet(DataContainer):
     
     """
     __metaclass__ = DataType
-    _reserved_attr = DataContainer._reserved_attr + ('data', 'shared_instance')
+    _reserved_attr = DataContainer._reserved_attr + (
+                                    'data', 'shared_instance', 'fingerprint', 
+                                    'from_records')
     ref = None
     Meta = DataSetMeta
     
@@ -475,22 +747,64 @@ class DataSet(DataContainer):
         # data def style classes, so they have refs before data is walked
         if len(self.meta.references) > 0:
             self.ref = mkref()
+        
+        self._add_rows()
             
-        for key, data in self.data():
-            if key in self:
+        if not self.ref:
+            # type style classes, since refs were discovered above
+            self.ref = mkref()
+    
+    def _add_rows(self):
+        meta = self.meta
+        for key, row in self._make_rows(self.data()):
+            if key in meta.data:
                 raise ValueError(
                     "data() cannot redeclare key '%s' "
                     "(this is already an attribute)" % key)
-                    
+            meta.keys.append(key)
+            meta.data[key] = row
+    
+    def _make_rows(self, rows):
+        """yields (key, row) for each (key, data) in rows.
+        
+        Dicts of data become a :class:`TupleRow` or a new row class
+        """
+        plan = type(self).compile_rows()
+        row_class = self.meta.row
+        row_columns = tuple(row_class.columns())
+        layouts = {}
+        # the sorted public columns of each set of dict keys :
+        known_columns = {}
+        for key, data in rows:
             if isinstance(data, dict):
-                # make a new class object for the row data
-                # so that a loaded dataset can instantiate this...
-                data = type(key, (self.meta.row,), data)
-            self._setdata(key, data)
-            
-        if not self.ref:
-            # type style classes, since refs were discovered above
-            self.ref = mkref()
+                names = tuple(data)
+                columns = known_columns.get(names)
+                if columns is None:
+                    columns = known_columns[names] = tuple(sorted([
+                            k for k in names if not k.startswith('_') and 
+                            k not in row_class._reserved_attr]))
+                if plan.rows:
+                    ref_columns = plan.reference_columns(key, columns)
+                else:
+                    ref_columns = None
+                if ref_columns is None and row_class is DataRow:
+                    # declared by data(), rows with the same columns 
+                    # share a layout :
+                    layout = layouts.get(columns)
+                    if layout is None:
+                        layout = layouts[columns] = RowLayout(columns)
+                    data = TupleRow(
+                            self, key, layout, [data[c] for c in columns])
+                else:
+                    attrs = dict(data)
+                    attrs['_ref_columns'] = ref_columns
+                    if row_columns:
+                        columns = tuple(sorted(set(columns + row_columns)))
+                    attrs['_columns'] = columns
+                    # make a new class object for the row data
+                    # so that a loaded dataset can instantiate this...
+                    data = type(key, (row_class,), attrs)
+            yield (key, data)
     
     def __iter__(self):
         """yields keys of self.meta"""
@@ -526,68 +840,128 @@ class DataSet(DataContainer):
         if self.meta._built:
             for k,v in self:
                 yield (k,v)
-                
-        def public_dir(obj):
-            for name in dir(obj):
-                if name.startswith("_"):
-                    continue
-                yield name
         
-        def add_ref_from_rowlike(rowlike):
-            if rowlike._dataset not in self.meta.references:
-                self.meta.references.append(rowlike._dataset)
-                    
-        empty = True
-        for name in public_dir(self.__class__):
-            val = getattr(self.__class__, name)
-            if not is_row_class(val):
-                continue
-            
-            empty = False
-            key = name
-            row_class = val
-            row = {}
-            
-            for col_name in public_dir(row_class):
-                col_val = getattr(row_class, col_name)
-                
-                if isinstance(col_val, Ref):
-                    # the .ref attribute
-                    continue
-                elif type(col_val) in (types.ListType, types.TupleType, set):
-                    for c in col_val:
-                        if is_rowlike(c):
-                            add_ref_from_rowlike(c)
-                        # NOP for Google Datastore (String)ListProperty
-                        # could definitely break any other storage mediums
-                        # ListProperty supports quite a few more types than these
-                        # see appengine.ext.db._ALLOWED_PROPERTY_TYPES
-                        elif type(c) in (types.StringType, types.UnicodeType, types.BooleanType,
-                                         types.FloatType, types.IntType):
-                             continue
-                        else:
-                            raise TypeError(
-                                "multi-value columns can only contain "
-                                "rowlike objects, not %s of type %s" % (
-                                                col_val, type(col_val)))
-                elif is_rowlike(col_val):
-                    add_ref_from_rowlike(col_val)
-                elif isinstance(col_val, Ref.Value):
-                    ref = col_val.ref
-                    if ref.dataset_class not in self.meta.references:
-                        # store the reference:
-                        self.meta.references.append(ref.dataset_class)
-                    
-                row[col_name] = col_val
-            yield (key, row)
-            
-        if empty:
+        # rows, columns and references were found when the class was created :
+        plan = type(self).compile_rows()
+        if not plan.rows:
             raise ValueError("cannot create an empty DataSet")
+        for ref_class in plan.references:
+            if ref_class not in self.meta.references:
+                # store the reference:
+                self.meta.references.append(ref_class)
+        for key, row_class, columns, ref_columns in plan.rows:
+            yield (key, dict([(col_name, getattr(row_class, col_name)) 
+                                                for col_name in columns]))
         self.meta._built = True
     
+    @classmethod
+    def fingerprint(cls, refresh=False):
+        """Returns a hex digest of the content of this :class:`DataSet` class.
+        
+        The digest covers row keys, column values, Refs, ``Meta`` options and 
+        the fingerprints of all referenced DataSet classes, so it can key 
+        caches of loaded data.  It is computed once per class and recomputed 
+        when the :class:`RowPlan` of the class is compiled again, i.e. after 
+        the class or one of its rows changed, or when refresh is True.
+        """
+        plan = cls.compile_rows(refresh=refresh)
+        cached = cls.__dict__.get('_fingerprint')
+        if cached is not None and cached[0] is plan and not refresh:
+            compiled_plan, digest, ref_digests = cached
+            for ref_class, ref_digest in ref_digests:
+                if ref_class.fingerprint() != ref_digest:
+                    break
+            else:
+                return digest
+        
+        # a new instance, so that neither rows nor references are resolved :
+        dataset = cls()
+        ref_digests = [(ref_class, ref_class.fingerprint()) 
+                            for ref_class in dataset.meta.references 
+                                if ref_class is not cls]
+        content = hashlib.sha1()
+        content.update("%s.%s\n" % (cls.__module__, cls.__name__))
+        for name in ('storable_name', 'primary_key'):
+            content.update("%s=%r\n" % (name, getattr(dataset.meta, name)))
+        storable = dataset.meta.storable
+        content.update("storable=%s\n" % (
+                        getattr(storable, '__name__', None) or 
+                        getattr(storable, 'name', None) or ''))
+        for ref_class, ref_digest in ref_digests:
+            content.update("references=%s\n" % ref_digest)
+        dataset._update_fingerprint(content)
+        digest = content.hexdigest()
+        cls._fingerprint = (plan, digest, ref_digests)
+        return digest
+    
+    def _update_fingerprint(self, content):
+        for key, row in self:
+            content.update("[%s]\n" % key)
+            for name in row.columns():
+                content.update("%s=%s\n" % (
+                                name, _describe_value(declared_value(row, name))))
+    
+    @classmethod
+    def from_records(cls, name, records, key=None, references=None, meta=None):
+        """Returns a new :class:`DataSet` class named name with a row for each 
+        dict in records.
+        
+        ``key``
+            the name of the column holding the key of each row or a callable 
+            that returns the key of a record.  If omitted, rows are named 
+            after their position, i.e. ``row_0``, ``row_1``, ...
+        
+        ``references``
+            a list of the DataSet classes referenced by the rows, see 
+            :class:`DataSetMeta`
+        
+        ``meta``
+            a ``Meta`` class or a dict of ``Meta`` attributes, i.e. 
+            ``dict(storable_name='Product')``
+        
+        Records are read once and no class is created per row, rows of the 
+        instances are :class:`TupleRow` objects::
+        
+            >>> Colors = DataSet.from_records('Colors', 
+            ...             [dict(name='red', hex='f00'), 
+            ...              dict(name='blue', hex='00f')], key='name')
+            >>> Colors().blue.hex
+            '00f'
+        
+        """
+        if key is None:
+            get_key = lambda record, i: "row_%s" % i
+        elif callable(key):
+            get_key = lambda record, i: key(record)
+        else:
+            get_key = lambda record, i: record[key]
+        keyed = []
+        seen = set()
+        for i, record in enumerate(records):
+            k = get_key(record, i)
+            if k in seen:
+                raise ValueError(
+                    "records cannot redeclare key '%s' of %s" % (k, name))
+            seen.add(k)
+            keyed.append((k, record))
+        
+        def data(self):
+            return iter(self._records)
+        return type(name, (cls,), {
+            'Meta': _records_meta(cls, meta, references), 
+            'data': data, 
+            '_records': keyed, 
+            # like a class declared in the calling module :
+            '__module__': sys._getframe(1).f_globals.get('__name__', 
+                                                         cls.__module__)})
+    
     @classmethod
     def shared_instance(cls, **kw):
-        """Returns or creates the singleton instance for this :class:`DataSet` class"""
+        """Returns or creates the singleton instance for this :class:`DataSet` class
+        
+        The instance is only shared within the current thread, and the 
+        threads that loaders start to work for it, see ``dataset_registry``.
+        """
         # fixme: default_refclass might be in **kw.  But only a loader can set a 
         # refclass.  hmm
         if cls in dataset_registry:
@@ -597,6 +971,417 @@ class DataSet(DataContainer):
             dataset_registry.register(dataset)
         return dataset
 
+def _records_meta(cls, meta, references, **attrs):
+    """a Meta class for a DataSet class created by from_records()"""
+    if isinstance(meta, dict):
+        attrs.update(meta)
+        meta = None
+    if meta is None:
+        meta = cls.Meta
+    if references is not None:
+        attrs['references'] = list(references)
+    # a subclass, so that the given Meta class is not modified :
+    return type(meta)('Meta', (meta,), attrs)
+
+def _describe_value(val):
+    """a stable description of a column value for :meth:`DataSet.fingerprint`"""
+    if is_rowlike(val):
+        return "<row %s.%s.%s>" % (
+                    val._dataset.__module__, val._dataset.__name__, val.__name__)
+    elif isinstance(val, Ref.Value):
+        return "<ref %s.%s.%s.%s>" % (
+                    val.ref.dataset_class.__module__, 
+                    val.ref.dataset_class.__name__, val.ref.key, val.attr_name)
+    elif type(val) in (types.ListType, types.TupleType):
+        return "[%s]" % ", ".join([_describe_value(v) for v in val])
+    elif type(val) is set:
+        return "set([%s])" % ", ".join(
+                                    sorted([_describe_value(v) for v in val]))
+    return repr(val)
+
+def _loaded_attr(row, name):
+    """the attribute name of the object stored for row, if it was loaded"""
+    stored = row._dataset.meta._stored_objects
+    if stored is None or row._key not in stored._ds_key_map:
+        raise AttributeError(
+            "%s has no column '%s' and has not been loaded" % (row, name))
+    return getattr(stored.get_object(row._key), name)
+
+def column_buffer(values):
+    """Returns values as one contiguous buffer.
+    
+    That is a NumPy array when NumPy is installed, an ``array.array`` for 
+    integers or floats otherwise.  Any other values are kept in a list.
+    """
+    if numpy is not None:
+        if isinstance(values, numpy.ndarray):
+            return values
+        buf = numpy.asarray(values)
+        if buf.ndim == 1 and buf.dtype.kind in 'biufSU':
+            return buf
+        return list(values)
+    if isinstance(values, array):
+        return values
+    values = list(values)
+    types_found = set([type(v) for v in values])
+    for typecode, value_type in (('l', int), ('d', float)):
+        if types_found == set([value_type]):
+            try:
+                return array(typecode, values)
+            except OverflowError:
+                break
+    return values
+
+def column_values(buf):
+    """Returns the values of a column buffer as a list of Python objects"""
+    if isinstance(buf, list):
+        return buf
+    return buf.tolist()
+
+def _python_value(val):
+    if numpy is not None and isinstance(val, numpy.generic):
+        return val.item()
+    return val
+
+class ColumnarRow(DataRow):
+    """A view of one row of a :class:`ColumnarDataSet`.
+    
+    Values are read from the column buffers of the DataSet when accessed.  
+    Undefined attributes are fetched from the stored object once the row has 
+    been loaded, like any :class:`DataRow`.
+    """
+    __slots__ = ('_index',)
+    
+    def __init__(self, dataset, key, index):
+        object.__setattr__(self, '_dataset', dataset)
+        object.__setattr__(self, '_key', key)
+        object.__setattr__(self, '_index', index)
+    
+    def __repr__(self):
+        return "<%s %s of %s at %s>" % (
+            self.__class__.__name__, self._key, 
+            self._dataset.__class__.__name__, hex(id(self)))
+    
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            return object.__getattribute__(self, name)
+        try:
+            buf = self._dataset.meta.columns[name]
+        except KeyError:
+            return _loaded_attr(self, name)
+        return _python_value(buf[self._index])
+    
+    def columns(self):
+        """yields all column names in alphabetical order"""
+        return iter(self._dataset.meta.column_names)
+
+class ColumnarRows(object):
+    """The keys and rows of a :class:`ColumnarDataSet`.
+    
+    Used as ``meta.keys`` and ``meta.data`` of the DataSet, rows are created 
+    on demand from the row positions.
+    """
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self._key_index = None
+    
+    def __len__(self):
+        return self.dataset.meta.num_rows
+    
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self.key(i)
+    
+    def __repr__(self):
+        return "<%s with %s rows>" % (self.__class__.__name__, len(self))
+    
+    def __contains__(self, key):
+        return self.index(key) is not None
+    
+    def __getitem__(self, key):
+        i = self.index(key)
+        if i is None:
+            raise KeyError(key)
+        return ColumnarRow(self.dataset, key, i)
+    
+    def get(self, key, default=None):
+        i = self.index(key)
+        if i is None:
+            return default
+        return ColumnarRow(self.dataset, key, i)
+    
+    def key(self, i):
+        """Returns the key of the row at position i"""
+        meta = self.dataset.meta
+        if meta.key_column:
+            return _python_value(meta.columns[meta.key_column][i])
+        return "%s_%s" % (meta.key_prefix, i)
+    
+    def index(self, key):
+        """Returns the position of the row at key or None"""
+        meta = self.dataset.meta
+        if meta.key_column:
+            if self._key_index is None:
+                self._key_index = dict([(k, i) for i, k in enumerate(
+                            column_values(meta.columns[meta.key_column]))])
+            return self._key_index.get(key)
+        prefix = "%s_" % meta.key_prefix
+        if not isinstance(key, basestring) or not key.startswith(prefix):
+            return None
+        try:
+            i = int(key[len(prefix):])
+        except ValueError:
+            return None
+        if i < 0 or i >= len(self) or key != self.key(i):
+            return None
+        return i
+
+class ColumnarDataSetMeta(DataSetMeta):
+    """
+    Configures a :class:`ColumnarDataSet` class.
+    
+    The following are acknowledged in addition to the 
+    :class:`DataSetMeta` attributes:
+    
+    ``key_column``
+        the name of a column holding the key of each row.  If omitted, rows 
+        are named after their position, i.e. ``row_0``, ``row_1``, ...
+    
+    ``key_prefix``
+        the prefix of keys made from row positions.  The default is ``row``
+    """
+    key_column = None
+    key_prefix = 'row'
+    columns = None
+    column_names = ()
+    num_rows = 0
+
+class ColumnarDataSet(DataSet):
+    """
+    A :class:`DataSet` that stores each column in one contiguous buffer.
+    
+    This is meant for very large reference tables.  Instead of declaring rows, 
+    override :meth:`data_columns` to return a dict of column names and 
+    sequences of values.  Each column is kept as a NumPy array if NumPy is 
+    installed, as an ``array.array`` for numbers otherwise, and as a list for 
+    anything else (see :func:`column_buffer`).  No objects are created per row 
+    until a row is accessed::
+    
+        >>> class ZipCodes(ColumnarDataSet):
+        ...     def data_columns(self):
+        ...         return dict(code=['%05d' % i for i in range(1000)], 
+        ...                     population=range(1000))
+        ... 
+        >>> zips = ZipCodes()
+        >>> len(zips)
+        1000
+        >>> zips.row_12.code
+        '00012'
+        >>> [r.population for r in zips[10:13]]
+        [10, 11, 12]
+    
+    A :class:`LoadableFixture <fixture.loadable.LoadableFixture>` loads it one 
+    chunk of column values at a time with 
+    :meth:`StorageMediumAdapter.save_columns() <fixture.loadable.loadable.StorageMediumAdapter.save_columns>`.  
+    Column values must be plain values, not rows or Refs.
+    
+    See :class:`ColumnarDataSetMeta` for the options of the inner ``Meta`` 
+    class.
+    """
+    _reserved_attr = DataSet._reserved_attr + (
+                                    'data_columns', 'column_chunks')
+    Meta = ColumnarDataSetMeta
+    
+    def __init__(self, default_refclass=None, default_meta=None):
+        if not default_meta:
+            default_meta = ColumnarDataSet.Meta
+        DataSet.__init__(self, default_refclass=default_refclass, 
+                         default_meta=default_meta)
+        columns = {}
+        num_rows = None
+        for name, values in self.data_columns().items():
+            columns[name] = column_buffer(values)
+            if num_rows is None:
+                num_rows = len(columns[name])
+            elif len(columns[name]) != num_rows:
+                raise ValueError(
+                    "column '%s' of %s has %s values, expected %s" % (
+                        name, self, len(columns[name]), num_rows))
+        if self.meta.key_column and self.meta.key_column not in columns:
+            raise ValueError("key_column '%s' is not a column of %s" % (
+                                                self.meta.key_column, self))
+        self.meta.columns = columns
+        self.meta.column_names = tuple(sorted(columns.keys()))
+        self.meta.num_rows = num_rows or 0
+        self.meta.keys = self.meta.data = ColumnarRows(self)
+    
+    def __iter__(self):
+        """yields keys and rows"""
+        rows = self.meta.data
+        for i in xrange(len(rows)):
+            key = rows.key(i)
+            yield (key, ColumnarRow(self, key, i))
+    
+    def __len__(self):
+        return self.meta.num_rows
+    
+    def __getitem__(self, key):
+        """self['foo'] returns a row and self[10:20] a list of rows"""
+        if isinstance(key, slice):
+            rows = self.meta.data
+            return [ColumnarRow(self, rows.key(i), i) 
+                        for i in xrange(*key.indices(len(self)))]
+        return self.meta.data[key]
+    
+    def _setdata(self, key, value):
+        # rows are views of the columns :
+        if key not in self.meta.data:
+            raise ValueError("cannot add row '%s' to %s" % (key, self))
+    
+    def data(self):
+        """Rows are not declared by a ColumnarDataSet, see :meth:`data_columns`"""
+        return ()
+    
+    def data_columns(self):
+        """Must return a dict of column names and sequences of values.
+        
+        All sequences must have the same length, one value per row.
+        """
+        raise NotImplementedError
+    
+    @classmethod
+    def from_records(cls, name, records, key=None, references=None, meta=None):
+        """Returns a new :class:`ColumnarDataSet` class named name with a 
+        column for each key of the dicts in records.
+        
+        ``key`` is the name of the column holding the key of each row (see 
+        ``key_column`` in :class:`ColumnarDataSetMeta`), other arguments are 
+        like :meth:`DataSet.from_records`.
+        """
+        columns = {}
+        num_records = 0
+        for i, record in enumerate(records):
+            for col in record:
+                if col not in columns:
+                    if i:
+                        raise ValueError(
+                            "record %s of %s has a new column '%s'" % (
+                                                            i, name, col))
+                    columns[col] = []
+                columns[col].append(record[col])
+            num_records += 1
+        for col, values in columns.items():
+            if len(values) != num_records:
+                raise ValueError(
+                    "column '%s' of %s is missing from some records" % (
+                                                                col, name))
+        meta_attrs = {}
+        if key is not None:
+            meta_attrs['key_column'] = key
+        
+        def data_columns(self):
+            return self._record_columns
+        return type(name, (cls,), {
+            'Meta': _records_meta(cls, meta, references, **meta_attrs), 
+            'data_columns': data_columns, 
+            '_record_columns': columns, 
+            '__module__': sys._getframe(1).f_globals.get('__name__', 
+                                                         cls.__module__)})
+    
+    def column_chunks(self, chunk_size):
+        """yields (start, stop, columns) for each chunk of rows.
+        
+        columns is a list of (column name, list of values) in alphabetical 
+        order of columns.
+        """
+        for start in xrange(0, len(self), chunk_size):
+            stop = min(start + chunk_size, len(self))
+            yield (start, stop, [
+                (name, column_values(self.meta.columns[name][start:stop]))
+                    for name in self.meta.column_names])
+    
+    def _update_fingerprint(self, content):
+        for name in self.meta.column_names:
+            content.update("[%s]\n" % name)
+            for start in xrange(0, len(self), 1000):
+                content.update("%r\n" % column_values(
+                            self.meta.columns[name][start:start+1000]))
+
+class StoredRows(object):
+    """The rows of a :class:`StreamingDataSet` that were loaded.
+    
+    Used as ``meta.data`` of the DataSet, each key returns the object that 
+    was stored for it.
+    """
+    def __init__(self, dataset):
+        self.dataset = dataset
+    
+    def __contains__(self, key):
+        return key in self.dataset.meta._stored_objects._ds_key_map
+    
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        return self.dataset.meta._stored_objects.get_object(key)
+    
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        return self[key]
+
+class StreamingDataSet(DataSet):
+    """
+    A :class:`DataSet` whose rows are generated while it is being loaded.
+    
+    Override ``data()`` with a generator of key/dict pairs just like a regular 
+    data()-style :class:`DataSet`.  Rows are not created when the DataSet is 
+    instantiated, a :class:`LoadableFixture <fixture.loadable.LoadableFixture>` 
+    consumes the generator in chunks of ``chunk_size`` rows and only keeps the 
+    keys and the stored object of each row.  This keeps memory constant when 
+    seeding very large tables::
+    
+        >>> class Events(StreamingDataSet):
+        ...     def data(self):
+        ...         for i in xrange(3):
+        ...             yield ('event_%s' % i, dict(name='Event %s' % i))
+        ... 
+        >>> events = Events()
+        >>> [(key, row.name) for key, row in events.stream()]
+        [('event_0', 'Event 0'), ('event_1', 'Event 1'), ('event_2', 'Event 2')]
+    
+    Once loaded, each key returns its stored object.  DataSets referenced 
+    by the rows must be declared in ``Meta.references`` since rows are not 
+    inspected before loading.
+    """
+    _reserved_attr = DataSet._reserved_attr + ('stream',)
+    
+    def _add_rows(self):
+        # rows are generated by stream() :
+        self.meta.data = StoredRows(self)
+    
+    def _setdata(self, key, value):
+        # only the key is kept, see StoredRows
+        self.meta.keys.append(key)
+    
+    def stream(self):
+        """yields (key, row) for each row generated by ``data()``"""
+        self.meta.keys = []
+        seen = set()
+        for key, row in self._make_rows(self.data()):
+            if key in seen:
+                raise ValueError(
+                    "data() cannot redeclare key '%s' "
+                    "(this is already an attribute)" % key)
+            seen.add(key)
+            yield (key, row)
+    
+    def _update_fingerprint(self, content):
+        for key, row in self.stream():
+            content.update("[%s]\n" % key)
+            for name in row.columns():
+                content.update("%s=%s\n" % (
+                                name, _describe_value(declared_value(row, name))))
+
 class DataSetContainer(object):
     """
     A ``DataSet`` of :class:`DataSet` classes
@@ -22,13 +22,21 @@ class DataSetActionException(Exception):
     ``stored_object``
         Stored object if there is one
         
+    ``key_range``
+        Keys of the first and last DataSet rows if the action failed for 
+        several rows at once
+        
     used by :mod:`fixture.loadable` classes
     """
     def __init__(self, etype, val, dataset, 
-                        key=None, row=None, stored_object=None):
+                        key=None, row=None, stored_object=None, 
+                        key_range=None):
         msg = "in %s" % dataset
         if key or row:
             msg = "with '%s' of '%s' %s" % (key, row, msg)
+        elif key_range:
+            msg = "with rows '%s' to '%s' %s" % (
+                                            key_range[0], key_range[1], msg)
         elif stored_object:
             msg = "with %s %s" % (stored_object, msg)
         
@@ -55,4 +63,12 @@ class StorageMediaNotFound(LookupError):
     
     used by :mod:`fixture.loadable` classes
     """
-    pass
\ No newline at end of file
+    pass
+
+class ReferenceCycleError(ValueError):
+    """
+    DataSets reference each other in a loop so they cannot be loaded in order.
+    
+    used by :mod:`fixture.loadable` classes
+    """
+    pass
@@ -37,12 +37,31 @@ class EntityMedium(EnvLoadableFixture.StorageMediumAdapter):
         
     def save(self, row, column_vals):
         """Save this entity to the Datastore"""
+        entity = self._entity(column_vals)
+        entity.put()
+        return entity
+    
+    def save_many(self, rows):
+        """Save entities for all rows to the Datastore in one batch put"""
+        entities = [self._entity(column_vals) for row, column_vals in rows]
+        try:
+            # ndb support
+            from google.appengine.ext import ndb
+            is_ndb = issubclass(self.medium, ndb.Model)
+        except ImportError:
+            is_ndb = False
+        if is_ndb:
+            ndb.put_multi(entities)
+        else:
+            from google.appengine.ext import db
+            db.put(entities)
+        return entities
+    
+    def _entity(self, column_vals):
         gen = [(k, self._entities_to_keys(v)) for k, v in column_vals]
-        entity = self.medium(
+        return self.medium(
             **dict(gen)
         )
-        entity.put()
-        return entity
 
 
 class GoogleDatastoreFixture(EnvLoadableFixture):
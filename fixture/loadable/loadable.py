@@ -5,18 +5,124 @@ See :ref:`Using LoadableFixture<using-loadable-fixture>` for examples.
 
 """
 # from __future__ import with_statement
-__all__ = ['LoadableFixture', 'EnvLoadableFixture', 'DBLoadableFixture', 'DeferredStoredObject']
-import sys, types
+__all__ = ['LoadableFixture', 'EnvLoadableFixture', 'DBLoadableFixture', 'DeferredStoredObject', 
+           'ClearStrategy', 'TruncateStrategy']
+import sys, types, threading, Queue
 from fixture.base import Fixture
 from fixture.util import ObjRegistry, _mklog
 from fixture.style import OriginalStyle
-from fixture.dataset import Ref, dataset_registry, DataRow, is_rowlike
-from fixture.exc import UninitializedError, LoadError, UnloadError, StorageMediaNotFound
+from fixture.dataset import (
+    Ref, dataset_registry, DataRow, TupleRow, ColumnarDataSet, 
+    StreamingDataSet, is_rowlike, declared_value)
+from fixture.exc import (
+    UninitializedError, LoadError, UnloadError, StorageMediaNotFound, 
+    ReferenceCycleError)
 import logging
 
 log     = _mklog("fixture.loadable")
 treelog = _mklog("fixture.loadable.tree")
 
+def _run_in_threads(tasks, workers):
+    """calls each of tasks with a worker, one thread per worker.
+    
+    A worker takes the next task as soon as it is done with its previous 
+    one.  This returns when all tasks are done and raises the first exception 
+    raised by a task, with its traceback.  Remaining tasks are not started 
+    after an exception.
+    """
+    queue = Queue.Queue()
+    for task in tasks:
+        queue.put(task)
+    errors = []
+    registry = dataset_registry.current()
+    def work(worker):
+        dataset_registry.activate(registry)
+        while not errors:
+            try:
+                task = queue.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                task(worker)
+            except:
+                errors.append(sys.exc_info())
+    threads = [threading.Thread(target=work, args=(worker,)) 
+                    for worker in workers[:len(tasks)]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        etype, val, tb = errors[0]
+        raise etype, val, tb
+
+def _is_current_plan(cached_plan):
+    """True if no DataSet class of a cached load plan has changed since."""
+    for ds_class, level, row_plan in cached_plan:
+        if ds_class.compile_rows() is not row_plan:
+            return False
+    return True
+
+class SavePipeline(object):
+    """Saves chunks of prepared rows in a thread of its own.
+    
+    save is called with each chunk passed to :meth:`put`, in the same order.  
+    At most size chunks wait in the queue so :meth:`put` blocks while rows 
+    are prepared faster than they are saved.  The first exception raised by 
+    save is raised again by the next call to :meth:`put`, :meth:`join` or 
+    :meth:`close` and the chunks after it are not saved.
+    """
+    def __init__(self, save, size):
+        self.save = save
+        self.queue = Queue.Queue(size)
+        self.errors = []
+        self.stopped = False
+        self.registry = dataset_registry.current()
+        self.thread = threading.Thread(target=self._consume)
+        self.thread.start()
+    
+    def _consume(self):
+        dataset_registry.activate(self.registry)
+        while True:
+            chunk = self.queue.get()
+            try:
+                try:
+                    if chunk is None:
+                        return
+                    if not (self.errors or self.stopped):
+                        self.save(chunk)
+                except:
+                    self.errors.append(sys.exc_info())
+            finally:
+                self.queue.task_done()
+    
+    def _raise_error(self):
+        if self.errors:
+            etype, val, tb = self.errors[0]
+            raise etype, val, tb
+    
+    def put(self, chunk):
+        """queue chunk to be saved"""
+        self._raise_error()
+        self.queue.put(chunk)
+    
+    def join(self):
+        """wait until every chunk queued so far is saved"""
+        self.queue.join()
+        self._raise_error()
+    
+    def close(self, abort=False):
+        """save the remaining chunks, unless abort is True, and stop the thread
+        
+        Errors are not raised when aborting.
+        """
+        if abort:
+            self.stopped = True
+        self.queue.put(None)
+        self.thread.join()
+        if not abort:
+            self._raise_error()
+
 class StorageMediumAdapter(object):
     """common interface for working with storable objects.
     """
@@ -39,9 +145,25 @@ class StorageMediumAdapter(object):
     
     def clearall(self):
         """Must clear all stored objects.
+        
+        By default this passes all stored objects to :meth:`clear_many`
         """
         log.info("CLEARING stored objects for %s", self.dataset)
-        for obj in self.dataset.meta._stored_objects:
+        try:
+            self.clear_many(list(self.dataset.meta._stored_objects))
+        except UnloadError:
+            raise
+        except Exception, e:
+            etype, val, tb = sys.exc_info()
+            raise UnloadError(etype, val, self.dataset), None, tb
+    
+    def clear_many(self, objs):
+        """Must clear all stored objects in the list objs.
+        
+        By default this calls :meth:`clear` once per object ; a medium that 
+        can clear several objects in one round trip should override it.
+        """
+        for obj in objs:
             try:
                 self.clear(obj)
             except Exception, e:
@@ -49,12 +171,54 @@ class StorageMediumAdapter(object):
                 raise UnloadError(etype, val, self.dataset, 
                                      stored_object=obj), None, tb
         
+    def truncate(self):
+        """Must remove all objects from the storage medium, including those 
+        that were not stored by this adapter.
+        
+        Used by :class:`TruncateStrategy`
+        """
+        raise NotImplementedError
+    
     def save(self, row, column_vals):
         """Given a DataRow, must save it somehow.
         
         column_vals is an iterable of (column_name, column_value)
         """
         raise NotImplementedError
+    
+    def save_many(self, rows):
+        """Given a list of (DataRow, column_vals) pairs, must save them all.
+        
+        Must return a list of stored objects in the same order as rows.  
+        By default this calls :meth:`save` once per row ; a medium that can 
+        store several rows in one round trip should override it.
+        """
+        return [self.save(row, column_vals) for row, column_vals in rows]
+    
+    def fetch_stored_objects(self):
+        """Must make the objects stored so far usable without the connection 
+        they were stored with, i.e. by fetching their values.
+        
+        Called in the thread that stored them when another thread may use 
+        them next, see :meth:`LoadableFixture.create_worker` and 
+        :meth:`LoadableFixture.can_pipeline`.  By default this does nothing.  
+        Rows of a StreamingDataSet need not all be fetched, so DataSets 
+        referencing one are always loaded in a single thread.
+        """
+        pass
+    
+    def save_columns(self, rows, columns):
+        """Given a list of DataRow objects and a list of (column_name, values) 
+        pairs holding one value per row, must save them all.
+        
+        Used to load a :class:`ColumnarDataSet <fixture.dataset.ColumnarDataSet>`.  
+        Must return a list of stored objects in the same order as rows.  By 
+        default this calls :meth:`save_many`.
+        """
+        names = [name for name, values in columns]
+        return self.save_many([
+            (row, zip(names, values)) for row, values in 
+                zip(rows, zip(*[values for name, values in columns]))])
         
     def visit_loader(self, loader):
         """A chance to visit the LoadableFixture object.
@@ -63,6 +227,35 @@ class StorageMediumAdapter(object):
         """
         pass
 
+class ClearStrategy(object):
+    """Unloads a DataSet by clearing each object that was stored for it.
+    
+    This is the default unload strategy of a :class:`DBLoadableFixture`
+    """
+    def unload_dataset(self, loader, dataset):
+        dataset.meta.storage_medium.clearall()
+
+class TruncateStrategy(object):
+    """Unloads a DataSet by emptying its storage medium outright.
+    
+    For example, a database table would be emptied with one statement no 
+    matter how many rows were loaded into it, see 
+    :meth:`StorageMediumAdapter.truncate`.  DataSets are still unloaded in 
+    the order computed by the :class:`LoadQueue`.
+    
+    .. note:: Only use this with databases that contain nothing but fixture 
+              data since any other objects in the storage medium are 
+              removed too.
+    
+    """
+    def unload_dataset(self, loader, dataset):
+        log.info("TRUNCATING storage medium for %s", dataset)
+        try:
+            dataset.meta.storage_medium.truncate()
+        except Exception, e:
+            etype, val, tb = sys.exc_info()
+            raise UnloadError(etype, val, dataset), None, tb
+
 class LoadQueue(ObjRegistry):
     """Keeps track of what class instances were loaded.
     
@@ -82,6 +275,8 @@ class LoadQueue(ObjRegistry):
         ObjRegistry.__init__(self)
         self.tree = {}
         self.limit = {}
+        # DataSets may be loaded by several workers at once :
+        self.lock = threading.Lock()
     
     def __repr__(self):
         return "<%s at %s>" % (
@@ -109,32 +304,46 @@ class LoadQueue(ObjRegistry):
     def register(self, obj, level):
         """register this object as "loaded" at level
         """
-        id = ObjRegistry.register(self, obj)
-        self._pushid(id, level)
+        self.lock.acquire()
+        try:
+            id = ObjRegistry.register(self, obj)
+            self._pushid(id, level)
+        finally:
+            self.lock.release()
         return id
     
     def referenced(self, obj, level):
         """tell the queue that this object was referenced again at level.
         """
         id = self.id(obj)
-        self._pushid(id, level)
+        self.lock.acquire()
+        try:
+            self._pushid(id, level)
+        finally:
+            self.lock.release()
     
     def to_unload(self):
         """yields a list of objects in an order suitable for unloading.
         """
+        for objs in self.unload_levels():
+            for obj in objs:
+                yield obj
+    
+    def unload_levels(self):
+        """yields one list of objects per level, in an order suitable for 
+        unloading.
+        
+        Nothing in a list depends on another object of the same list so 
+        these can be unloaded in any order, or at once.
+        """
         level_nums = self.tree.keys()
         level_nums.sort()
         treelog.info("*** unload order ***")
         for level in level_nums:
-            unload_queue = self.tree[level]
-            verbose_obj = []
-            
-            for id in unload_queue:
-                obj = self.registry[id]
-                verbose_obj.append(obj.__class__.__name__)
-                yield obj
-            
-            treelog.info("%s. %s", level, verbose_obj)
+            objs = [self.registry[id] for id in self.tree[level]]
+            treelog.info("%s. %s", level, 
+                         [obj.__class__.__name__ for obj in objs])
+            yield objs
             
 class LoadableFixture(Fixture):
     """
@@ -154,18 +363,50 @@ class LoadableFixture(Fixture):
     medium
         optional LoadableFixture.StorageMediumAdapter to store DataSet 
         objects with
+    chunk_size
+        maximum number of rows of a DataSet to pass to 
+        :meth:`StorageMediumAdapter.save_many` at once (defaults to 500)
+    workers
+        maximum number of DataSets to load or unload at once, each in a 
+        thread with its own connection to the storage media (defaults to 1).  
+        This only applies when the fixture can create workers, see 
+        :meth:`create_worker`
+    pipeline
+        if set, rows are prepared for saving while the previous chunks of 
+        rows are saved in another thread, and this is the maximum number of 
+        prepared chunks waiting to be saved.  This only applies when the 
+        storage media can be used from two threads at once, see 
+        :meth:`can_pipeline`
+    
+    Load plans, storage media and the columns of each row are cached per 
+    DataSet class for the lifetime of the fixture, see :meth:`plan_load`.  
+    Call :meth:`clear_plans` if the env changes in between loads.
     
     """
     style = OriginalStyle()
     dataclass = Fixture.dataclass
+    chunk_size = 500
+    workers = 1
+    pipeline = 0
     
-    def __init__(self, style=None, medium=None, **kw):
+    def __init__(self, style=None, medium=None, chunk_size=None, workers=None, 
+                        pipeline=None, **kw):
         Fixture.__init__(self, loader=self, **kw)
         if style:
             self.style = style
         if medium:
             self.Medium = medium
+        if chunk_size:
+            self.chunk_size = chunk_size
+        if workers:
+            self.workers = workers
+        if pipeline:
+            self.pipeline = pipeline
         self.loaded = None
+        # loaders created by create_worker(), kept for the next load :
+        self.worker_pool = []
+        self.dataset_workers = {}
+        self.clear_plans()
     
     StorageMediumAdapter = StorageMediumAdapter
     Medium = StorageMediumAdapter
@@ -176,21 +417,126 @@ class LoadableFixture(Fixture):
         """attach a :class:`StorageMediumAdapter` to DataSet"""
         raise NotImplementedError
     
+    def can_pipeline(self):
+        """True if rows can be prepared while other rows are saved.
+        
+        Rows are then saved by a :class:`SavePipeline` when ``pipeline`` is 
+        set.  Preparing a row resolves its references, so the stored objects 
+        of referenced DataSets are fetched before the pipeline starts (see 
+        :meth:`StorageMediumAdapter.fetch_stored_objects`).  Rows referencing 
+        rows of their own DataSet are prepared once those are saved.  This 
+        is True by default.
+        """
+        return True
+    
+    def clear_plans(self):
+        """forget all cached load plans, storage media and row columns."""
+        self.plans = {}
+        self.storables = {}
+        self.row_columns = {}
+    
     def begin(self, unloading=False):
         """begin loading"""
         if not unloading:
             self.loaded = self.LoadQueue()
+            self.dataset_workers = {}
     
     def commit(self):
         """commit load transaction"""
         raise NotImplementedError
     
+    def create_worker(self):
+        """returns a loader that loads DataSets in a thread of its own, or None.
+        
+        A worker is typically a copy of this fixture with its own connection 
+        to the storage media.  It is passed the :class:`LoadQueue` of this 
+        fixture and loads each DataSet with 
+        ``wrap_in_transaction(routine, unloading=True)`` so that the queue is 
+        kept.  The DataSet is later unloaded by the same worker.  Before the 
+        next level of DataSets is loaded by other workers, each worker calls 
+        :meth:`StorageMediumAdapter.fetch_stored_objects` so that its 
+        connection is never used from another thread.
+        
+        Workers are kept for the next load.  By default this returns None, 
+        meaning that the storage media cannot be shared between threads and 
+        all DataSets are loaded in a single transaction.
+        """
+        return None
+    
     def load(self, data):
-        """load data"""
+        """load data
+        
+        With more than one of ``workers``, the DataSets at each level of the 
+        plan (see :meth:`plan_load`) do not reference each other and are 
+        loaded at once, each by a worker in a transaction of its own.  The 
+        deepest level is loaded first and each level is done before the 
+        next one starts.  If a DataSet cannot be loaded then the DataSets 
+        already loaded by workers are unloaded again.
+        """
         def loader():
-            for ds in data:
-                self.load_dataset(ds)
+            plan = self.plan_load(list(data))
+            workers = self._workers_for(plan)
+            if workers:
+                self._load_with_workers(plan, workers)
+                return
+            for ds, level in plan:
+                self._load_planned_dataset(ds, level)
         self.wrap_in_transaction(loader, unloading=False)
+    
+    def _workers_for(self, plan):
+        """workers to load plan with, or an empty list to load it serially."""
+        if self.workers <= 1:
+            return []
+        widths = {}
+        for ds, level in plan:
+            widths[level] = widths.get(level, 0) + 1
+        num_workers = min(self.workers, max(widths.values()))
+        if num_workers <= 1:
+            return []
+        if [ds for ds, level in plan if self._references_stream(ds)]:
+            # streamed rows are read with the connection of their worker :
+            return []
+        while len(self.worker_pool) < num_workers:
+            worker = self.create_worker()
+            if worker is None:
+                break
+            self.worker_pool.append(worker)
+        return self.worker_pool[:num_workers]
+    
+    def _load_with_workers(self, plan, workers):
+        levels = {}
+        for ds, level in plan:
+            levels.setdefault(level, []).append(ds)
+        for worker in workers:
+            worker.loaded = self.loaded
+        def loading(ds, level):
+            def load_in_worker(worker):
+                self.dataset_workers[ds.__class__] = worker
+                def load():
+                    worker._load_planned_dataset(ds, level)
+                    # rows referenced by the next level are read here :
+                    ds.meta.storage_medium.fetch_stored_objects()
+                worker.wrap_in_transaction(load, unloading=True)
+            return load_in_worker
+        level_nums = levels.keys()
+        level_nums.sort()
+        level_nums.reverse()
+        try:
+            for level in level_nums:
+                # datasets of the same level never reference each other :
+                _run_in_threads(
+                    [loading(ds, level) for ds in levels[level]], workers)
+        except:
+            etype, val, tb = sys.exc_info()
+            # workers have committed what they loaded so far :
+            try:
+                for datasets in self.loaded.unload_levels():
+                    self._unload_level(datasets)
+                self.loaded.clear()
+            except:
+                log.error("could not unload data after a failed load", 
+                          exc_info=True)
+            raise etype, val, tb
         
     def load_dataset(self, ds, level=1):
         """load this dataset and all its dependent datasets.
@@ -202,6 +548,101 @@ class LoadableFixture(Fixture):
         objects unloaded
         
         """
+        for planned_ds, planned_level in self.plan_load([ds], level=level):
+            self._load_planned_dataset(planned_ds, planned_level)
+    
+    def plan_load(self, datasets, level=1):
+        """returns a list of (dataset, level) pairs in the order to load them.
+        
+        The reference graph of datasets is walked once, without recursion, 
+        so that a dataset referenced from many places is only planned once.  
+        Referenced datasets always come before the datasets that reference 
+        them.  Each dataset in datasets is at level or deeper and every 
+        referenced dataset is one level deeper than the deepest dataset that 
+        references it.
+        
+        Raises :class:`ReferenceCycleError <fixture.exc.ReferenceCycleError>` 
+        if datasets reference each other in a loop.
+        
+        The plan is cached per tuple of DataSet classes, so the next plan for 
+        the same classes only looks up the shared instance of each 
+        referenced class.  It is walked again once the :class:`RowPlan 
+        <fixture.dataset.RowPlan>` of a planned class was compiled again.
+        """
+        plan_key = (tuple([ds.__class__ for ds in datasets]), level)
+        cached = self.plans.get(plan_key)
+        if cached is not None and _is_current_plan(cached):
+            instances = {}
+            for ds in datasets:
+                instances.setdefault(ds.__class__, ds)
+            plan = []
+            for ds_class, ds_level, row_plan in cached:
+                if ds_class not in instances:
+                    instances[ds_class] = ds_class.shared_instance(
+                                            default_refclass=self.dataclass)
+                plan.append((instances[ds_class], ds_level))
+            return plan
+        plan = self._walk_references(datasets, level)
+        self.plans[plan_key] = [(ds.__class__, l, ds.__class__.compile_rows()) 
+                                                            for ds, l in plan]
+        return plan
+    
+    def _walk_references(self, datasets, level):
+        VISITING, VISITED = 1, 2
+        state = {}
+        references = {}
+        instances = {}
+        order = []
+        
+        def referenced_datasets(ds):
+            refs = []
+            for ref_class in ds.meta.references:
+                if ref_class is type(ds):
+                    # rows referencing rows of the same dataset
+                    continue
+                if ref_class not in instances:
+                    instances[ref_class] = ref_class.shared_instance(
+                                            default_refclass=self.dataclass)
+                refs.append(instances[ref_class])
+            references[id(ds)] = refs
+            return refs
+        
+        for root in datasets:
+            if id(root) in state:
+                continue
+            state[id(root)] = VISITING
+            path = [root]
+            stack = [iter(referenced_datasets(root))]
+            while stack:
+                for ref_ds in stack[-1]:
+                    if state.get(id(ref_ds)) == VISITING:
+                        cycle = path[path.index(ref_ds):] + [ref_ds]
+                        raise ReferenceCycleError(
+                            "datasets reference each other in a loop: %s" % 
+                            " -> ".join([d.__class__.__name__ for d in cycle]))
+                    if id(ref_ds) not in state:
+                        state[id(ref_ds)] = VISITING
+                        path.append(ref_ds)
+                        stack.append(iter(referenced_datasets(ref_ds)))
+                        break
+                else:
+                    stack.pop()
+                    ds = path.pop()
+                    state[id(ds)] = VISITED
+                    order.append(ds)
+        
+        levels = {}
+        for root in datasets:
+            levels[id(root)] = level
+        # order is a post-order so, reversed, referencing datasets come first :
+        for ds in reversed(order):
+            for ref_ds in references[id(ds)]:
+                levels[id(ref_ds)] = max(levels.get(id(ref_ds), level), 
+                                         levels[id(ds)] + 1)
+        return [(ds, levels[id(ds)]) for ds in order]
+    
+    def _load_planned_dataset(self, ds, level):
+        """load the rows of ds, its references must already be loaded."""
         is_parent = level==1
         
         levsep = is_parent and "/--------" or "|__.."
@@ -209,11 +650,6 @@ class LoadableFixture(Fixture):
             "%s%s%s (%s)", level * '  ', levsep, ds.__class__.__name__, 
                                             (is_parent and "parent" or level))
         
-        for ref_ds in ds.meta.references:
-            r = ref_ds.shared_instance(default_refclass=self.dataclass)
-            new_level = level+1
-            self.load_dataset(r,  level=new_level)
-        
         self.attach_storage_medium(ds)
         
         if ds in self.loaded:
@@ -222,27 +658,194 @@ class LoadableFixture(Fixture):
             return
         
         log.info("LOADING rows in %s", ds)
-        ds.meta.storage_medium.visit_loader(self)
-        registered = False
-        for key, row in ds:
+        medium = ds.meta.storage_medium
+        medium.visit_loader(self)
+        if isinstance(ds, ColumnarDataSet):
+            self._load_columns(ds, level)
+            return
+        # rows are saved in chunks of (key, row, column_vals generator) :
+        pending = []
+        # keys of rows that may not be saved yet :
+        pending_keys = set()
+        status = {'registered': False}
+        
+        def save_chunk(chunk):
             try:
-                self.resolve_row_references(ds, row)
-                if not isinstance(row, DataRow):
-                    row = row(ds)
-                def column_vals():
-                    for c in row.columns():
-                        yield (c, self.resolve_stored_object(getattr(row, c)))
-                obj = ds.meta.storage_medium.save(row, column_vals())
+                stored = medium.save_many(
+                    [(row, column_vals) for key, row, column_vals in chunk])
+            except LoadError:
+                # a value of one row could not be resolved, see column_vals
+                raise
+            except Exception, e:
+                etype, val, tb = sys.exc_info()
+                if len(chunk) == 1:
+                    key, row, column_vals = chunk[0]
+                    raise LoadError(etype, val, ds, key=key, row=row), None, tb
+                raise LoadError(etype, val, ds, 
+                                key_range=(chunk[0][0], chunk[-1][0])), None, tb
+            for (key, row, column_vals), obj in zip(chunk, stored):
                 ds.meta._stored_objects.store(key, obj)
                 # save the instance in place of the class...
                 ds._setdata(key, row)
-                if not registered:
-                    self.loaded.register(ds, level)
-                    registered = True
-                
+            if not status['registered']:
+                self.loaded.register(ds, level)
+                status['registered'] = True
+        
+        pipeline = None
+        if (self.pipeline and self.can_pipeline() and 
+                not self._references_stream(ds)):
+            # references are resolved in this thread while the pipeline's 
+            # thread saves rows, so nothing may be selected in between :
+            self._fetch_references(ds)
+            pipeline = SavePipeline(save_chunk, self.pipeline)
+        
+        def save_pending():
+            chunk = pending[:]
+            del pending[:]
+            if pipeline is None:
+                save_chunk(chunk)
+                pending_keys.clear()
+            else:
+                pipeline.put(chunk)
+        
+        if isinstance(ds, StreamingDataSet):
+            # rows are generated now and only their keys are kept :
+            rows = ds.stream()
+        else:
+            rows = ds
+        try:
+            for key, row in rows:
+                if pending_keys and self._refers_to_keys(ds, row, pending_keys):
+                    # a row of this dataset must be stored before it can be 
+                    # referenced (i.e. jenny.friend = bob)
+                    if pending:
+                        save_pending()
+                    if pipeline is not None:
+                        pipeline.join()
+                        pending_keys.clear()
+                try:
+                    self.resolve_row_references(ds, row)
+                    if not isinstance(row, DataRow):
+                        row = row(ds)
+                except Exception, e:
+                    etype, val, tb = sys.exc_info()
+                    raise LoadError(etype, val, ds, key=key, row=row), None, tb
+                def column_vals(row=row, key=key):
+                    for c in self._row_columns(ds, key, row):
+                        try:
+                            value = self.resolve_stored_object(getattr(row, c))
+                        except Exception, e:
+                            etype, val, tb = sys.exc_info()
+                            raise LoadError(etype, val, ds, 
+                                            key=key, row=row), None, tb
+                        yield (c, value)
+                if pipeline is None:
+                    pending.append((key, row, column_vals()))
+                else:
+                    # values are resolved here while other rows are saved :
+                    pending.append((key, row, list(column_vals())))
+                pending_keys.add(key)
+                if len(pending) >= self.chunk_size:
+                    save_pending()
+            if pending:
+                save_pending()
+        except:
+            if pipeline is not None:
+                etype, val, tb = sys.exc_info()
+                pipeline.close(abort=True)
+                raise etype, val, tb
+            raise
+        if pipeline is not None:
+            pipeline.close()
+    
+    def _references_stream(self, ds):
+        """True if ds references a StreamingDataSet.
+        
+        Its stored objects may not all be fetched at once, see 
+        :meth:`StorageMediumAdapter.fetch_stored_objects`
+        """
+        for ref_class in ds.meta.references:
+            if issubclass(ref_class, StreamingDataSet):
+                return True
+        return False
+    
+    def _fetch_references(self, ds):
+        """fetch the stored objects of the loaded DataSets that ds references.
+        
+        See :meth:`StorageMediumAdapter.fetch_stored_objects`
+        """
+        for ref_class in ds.meta.references:
+            if ref_class is type(ds) or ref_class not in self.loaded:
+                continue
+            medium = self.loaded[ref_class].meta.storage_medium
+            if medium is not None:
+                medium.fetch_stored_objects()
+    
+    def _load_columns(self, ds, level):
+        """saves the column buffers of ds one chunk of rows at a time."""
+        medium = ds.meta.storage_medium
+        for start, stop, columns in ds.column_chunks(self.chunk_size):
+            rows = ds[start:stop]
+            try:
+                stored = medium.save_columns(rows, columns)
             except Exception, e:
                 etype, val, tb = sys.exc_info()
-                raise LoadError(etype, val, ds, key=key, row=row), None, tb
+                if len(rows) == 1:
+                    raise LoadError(etype, val, ds, 
+                                    key=rows[0]._key, row=rows[0]), None, tb
+                raise LoadError(etype, val, ds, key_range=(
+                                    rows[0]._key, rows[-1]._key)), None, tb
+            for row, obj in zip(rows, stored):
+                ds.meta._stored_objects.store(row._key, obj)
+        self.loaded.register(ds, level)
+    
+    def _row_columns(self, ds, key, row):
+        """the column names of row, cached per DataSet class and key."""
+        if isinstance(row, TupleRow):
+            # already shared by all rows with the same columns
+            return row._layout.columns
+        if getattr(row, '_columns', None) is not None:
+            # compiled with the DataSet class, see RowPlan
+            return row._columns
+        cache_key = (ds.__class__, key)
+        if cache_key not in self.row_columns:
+            self.row_columns[cache_key] = list(row.columns())
+        return self.row_columns[cache_key]
+    
+    def _reference_columns(self, row):
+        """the names of columns in row that may hold references.
+        
+        These were compiled with the DataSet class (see 
+        :class:`fixture.dataset.RowPlan`) unless the row was declared by 
+        an overridden ``data()`` method
+        """
+        ref_columns = getattr(row, '_ref_columns', None)
+        if ref_columns is None:
+            return row.columns()
+        return ref_columns
+    
+    def _refers_to_keys(self, current_dataset, row, keys):
+        """True if row references a row of current_dataset named in keys."""
+        def refers(candidate):
+            if is_rowlike(candidate):
+                return (candidate._dataset is type(current_dataset) and 
+                        candidate.__name__ in keys)
+            elif isinstance(candidate, Ref.Value):
+                return (candidate.ref.dataset_class is type(current_dataset) 
+                        and candidate.ref.key in keys)
+            return False
+        if isinstance(row, DataRow) and not isinstance(row, TupleRow):
+            # inspect the class so that Ref values are not resolved :
+            row = row.__class__
+        for name in self._reference_columns(row):
+            val = declared_value(row, name)
+            if type(val) in (types.ListType, types.TupleType, set):
+                for v in val:
+                    if refers(v):
+                        return True
+            elif refers(val):
+                return True
+        return False
     
     def resolve_row_references(self, current_dataset, row):        
         """resolve this DataRow object's referenced values.
@@ -262,8 +865,8 @@ class LoadableFixture(Fixture):
                 # parent organization)
                 return candidate
                 
-        for name in row.columns():
-            val = getattr(row, name)
+        for name in self._reference_columns(row):
+            val = declared_value(row, name)
             if type(val) in (types.ListType, types.TupleType):
                 # i.e. categories = [python, ruby]
                 setattr(row, name, map(resolve_stored_object, val))
@@ -288,19 +891,69 @@ class LoadableFixture(Fixture):
         """called in a finally block after load transaction has begun"""
         pass
     
+    def fetch_stored_objects(self):
+        """fetch the stored objects of every loaded DataSet so that they can 
+        be used from another thread than the one that loaded them, see 
+        :meth:`StorageMediumAdapter.fetch_stored_objects`
+        """
+        if self.loaded is None:
+            return
+        for ds in self.loaded.to_unload():
+            if ds.meta.storage_medium is not None:
+                ds.meta.storage_medium.fetch_stored_objects()
+    
     def unload(self):
-        """unload data"""
+        """unload data
+        
+        DataSets are unloaded one level of the :class:`LoadQueue` at a time.  
+        With more than one of ``workers``, the DataSets of a level that were 
+        loaded by different workers are unloaded at once, each by its own 
+        worker, and the level is done before the next one starts.
+        """
         if self.loaded is None:
             raise UninitializedError(
                 "Cannot unload data because it has not yet been loaded in this "
                 "process.  Call data.setup() before data.teardown()")
         def unloader():
-            for dataset in self.loaded.to_unload():
-                self.unload_dataset(dataset)
+            for datasets in self.loaded.unload_levels():
+                self._unload_level(datasets)
             self.loaded.clear()
+            self.dataset_workers = {}
             dataset_registry.clear()
         self.wrap_in_transaction(unloader, unloading=True)
     
+    def _unload_level(self, datasets):
+        """unload datasets of the same level, at once if workers loaded them."""
+        workers = []
+        worker_datasets = {}
+        for dataset in datasets:
+            worker = self.dataset_workers.get(dataset.__class__)
+            if worker is None:
+                self.unload_dataset(dataset)
+                continue
+            if id(worker) not in worker_datasets:
+                workers.append(worker)
+                worker_datasets[id(worker)] = []
+            worker_datasets[id(worker)].append(dataset)
+        def unloading(worker):
+            # stored objects may be bound to the worker that loaded them :
+            def unload_in_worker(thread_worker):
+                for dataset in worker_datasets[id(worker)]:
+                    self._unload_in_worker(dataset)
+            return unload_in_worker
+        tasks = [unloading(worker) for worker in workers]
+        if self.workers > 1 and len(tasks) > 1:
+            _run_in_threads(tasks, workers[:self.workers])
+        else:
+            for task in tasks:
+                task(None)
+    
+    def _unload_in_worker(self, dataset):
+        """unload dataset in a transaction of the worker that loaded it."""
+        worker = self.dataset_workers[dataset.__class__]
+        worker.wrap_in_transaction(
+            lambda: worker.unload_dataset(dataset), unloading=True)
+    
     def unload_dataset(self, dataset):
         """unload data stored for this dataset"""
         dataset.meta.storage_medium.clearall()
@@ -353,6 +1006,11 @@ class EnvLoadableFixture(LoadableFixture):
         
         storable = ds.meta.storable
         
+        if not storable and ds.__class__ in self.storables:
+            storable_name, storable = self.storables[ds.__class__]
+            if not ds.meta.storable_name:
+                ds.meta.storable_name = storable_name
+        
         if not storable:
             if not ds.meta.storable_name:
                 ds.meta.storable_name = self.style.guess_storable_name(
@@ -376,6 +1034,7 @@ class EnvLoadableFixture(LoadableFixture):
                     "could not find %s '%s' for "
                     "dataset %s in self.env (%s)" % (
                         self.Medium, ds.meta.storable_name, ds, repr_env))
+            self.storables[ds.__class__] = (ds.meta.storable_name, storable)
                         
         if storable == ds.__class__:
             raise ValueError(
@@ -396,17 +1055,44 @@ class DBLoadableFixture(EnvLoadableFixture):
     
     More specifically, one that forces its implementation to run atomically 
     (within a begin / commit / rollback block).
+    
+    Keyword Arguments:
+    
+    unload_strategy
+        an object whose ``unload_dataset(loader, dataset)`` method unloads 
+        each DataSet.  Defaults to a :class:`ClearStrategy`, which deletes 
+        every stored object.  A :class:`TruncateStrategy` empties every 
+        table that was loaded instead.
+    
+    Data loaded once for several tests can be restored in between with 
+    :meth:`begin_savepoint` and :meth:`rollback_savepoint`, see 
+    :meth:`FixtureData.setup_scope <fixture.base.FixtureData.setup_scope>`.
     """
-    def __init__(self, dsn=None, **kw):
+    unload_strategy = ClearStrategy()
+    
+    def __init__(self, dsn=None, unload_strategy=None, **kw):
         EnvLoadableFixture.__init__(self, **kw)
         self.dsn = dsn
         self.transaction = None
+        self.savepoint = None
+        if unload_strategy:
+            self.unload_strategy = unload_strategy
     
     def begin(self, unloading=False):
         """begin loading data"""
         EnvLoadableFixture.begin(self, unloading=unloading)
         self.transaction = self.create_transaction()
     
+    def begin_savepoint(self):
+        """begin a savepoint that :meth:`rollback_savepoint` returns to.
+        
+        Everything done in the database after this, i.e. by a test, is 
+        undone on rollback while the loaded data stays in place.
+        """
+        if self.savepoint is not None:
+            raise ValueError("a savepoint was already begun")
+        self.savepoint = self.create_savepoint()
+    
     def commit(self):
         """call transaction.commit() on transaction returned by :meth:`DBLoadableFixture.create_transaction`"""
         self.transaction.commit()
@@ -419,9 +1105,31 @@ class DBLoadableFixture(EnvLoadableFixture):
         """
         raise NotImplementedError
     
+    def create_savepoint(self):
+        """must return a savepoint object that implements rollback()
+        
+        .. note:: Code under test has to use the same connection as the 
+                  fixture for its changes to be rolled back.
+        
+        """
+        raise NotImplementedError
+    
     def rollback(self):
         """call transaction.rollback() on transaction returned by :meth:`DBLoadableFixture.create_transaction`"""
         self.transaction.rollback()
+    
+    def rollback_savepoint(self):
+        """roll back to the savepoint begun by :meth:`begin_savepoint`"""
+        if self.savepoint is None:
+            raise UninitializedError(
+                "Cannot roll back to a savepoint because none was begun.  "
+                "Call begin_savepoint() first")
+        savepoint, self.savepoint = self.savepoint, None
+        savepoint.rollback()
+    
+    def unload_dataset(self, dataset):
+        """unload data stored for this dataset using the unload strategy"""
+        self.unload_strategy.unload_dataset(self, dataset)
 
 class DeferredStoredObject(object):
     """A stored representation of a row in a DataSet, deferred.
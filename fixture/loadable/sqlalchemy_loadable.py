@@ -7,8 +7,12 @@ See :ref:`Using LoadableFixture<using-loadable-fixture>` for examples.
 
 """
 
-import sys
+import sys, os, copy, shutil, tempfile, hashlib
+import cPickle as pickle
 from fixture.loadable import DBLoadableFixture
+from fixture.dataset import (
+    DataRow, TupleRow, StreamingDataSet, dataset_registry)
+from fixture.dataset.dataset import DataSetStore
 from fixture.exc import UninitializedError
 import logging
 
@@ -18,14 +22,16 @@ try:
     from sqlalchemy.orm import sessionmaker, scoped_session
 except ImportError:
     Session = None
+    session_factory = None
     sa_major = None
 else:
     import sqlalchemy
     sa_major = float(sqlalchemy.__version__[:3]) # i.e. 0.4 or 0.5
     if sa_major < 0.5:
-        Session = scoped_session(sessionmaker(autoflush=False, transactional=True), scopefunc=lambda:__name__)
+        session_factory = sessionmaker(autoflush=False, transactional=True)
     else:
-        Session = scoped_session(sessionmaker(autoflush=False, autocommit=False), scopefunc=lambda:__name__)
+        session_factory = sessionmaker(autoflush=False, autocommit=False)
+    Session = scoped_session(session_factory, scopefunc=lambda:__name__)
 
 def negotiated_medium(obj, dataset):
     if is_table(obj):
@@ -97,10 +103,60 @@ class SQLAlchemyFixture(DBLoadableFixture):
         SQLAlchemy object so you should only set this if you know what you 
         doing.
     
+    ``chunk_size``
+        Maximum number of rows of a DataSet to insert at once.
+    
+    ``bulk_mappings``
+        If True, rows of mapped classes are not loaded as objects into the 
+        session but inserted in bulk into the mapper's table, similar to 
+        ``Session.bulk_insert_mappings()``.  Many-to-one relations are 
+        resolved to their foreign key columns.  This is much faster for 
+        large DataSets but there is no unit of work tracking, so 
+        one-to-many and many-to-many relations cannot be stored this way.
+    
+    ``statements``
+        A :class:`StatementCache` for the insert, delete and select statements 
+        executed on tables.  A new cache is created by default and kept for 
+        all load and unload cycles of this fixture.
+    
+    ``rollback_teardown``
+        If True, data is loaded into a transaction on ``fixture.connection`` 
+        that is never committed and ``teardown()`` simply rolls it back 
+        instead of deleting rows.  This requires an engine or a connection 
+        and the code under test must use ``fixture.connection`` (or a session 
+        bound to it) to see the data.
+    
+    ``sqlite_snapshots``
+        If True, the first load of some DataSet classes into a SQLite 
+        ``engine`` is saved as a :class:`SQLiteSnapshot` and every later 
+        load of the same classes restores that snapshot instead of inserting 
+        rows.  ``teardown()`` restores the database as it was before the 
+        first load.  Loaded rows are then only available as 
+        :class:`SnapshotRow` objects holding their column values.  This 
+        requires an engine ; a connection or session cannot be passed in.
+    
+    ``snapshot_dir``
+        A directory to keep the snapshots of ``sqlite_snapshots`` in, which 
+        is then turned on.  Snapshots are named after a fingerprint of the 
+        DataSets and the database schema (see :meth:`snapshot_fingerprint`) 
+        so that later processes restore them instead of loading any data.
+        Only the snapshots of loaded data are kept.
+    
+    ``workers``
+        Maximum number of DataSets to load at once, each on a connection of 
+        its own from ``engine``, see :meth:`create_worker`.
+    
+    ``pipeline``
+        Maximum number of chunks of rows waiting to be inserted while the 
+        next rows are prepared, see :meth:`can_pipeline`.
+    
     """
     Medium = staticmethod(negotiated_medium)
     
-    def __init__(self, engine=None, connection=None, session=None, scoped_session=None, **kw):
+    def __init__(self, engine=None, connection=None, session=None, scoped_session=None, 
+                        bulk_mappings=False, statements=None, 
+                        rollback_teardown=False, sqlite_snapshots=False, 
+                        snapshot_dir=None, **kw):
         # ensure import error by simulating what would happen in the global module :
         from sqlalchemy.orm import sessionmaker, scoped_session as sa_scoped_session 
         
@@ -108,6 +164,24 @@ class SQLAlchemyFixture(DBLoadableFixture):
         self.engine = engine
         self.connection = connection
         self.session = session
+        self.bulk_mappings = bulk_mappings
+        self.rollback_teardown = rollback_teardown
+        if snapshot_dir:
+            sqlite_snapshots = True
+        self.sqlite_snapshots = sqlite_snapshots
+        self.snapshot_dir = snapshot_dir
+        self.snapshots = {}
+        self.snapshot = None
+        self.shares_engine = (engine is not None and connection is None and 
+                        session is None and scoped_session is None)
+        if sqlite_snapshots and (engine is None or connection is not None or 
+                        session is not None or scoped_session is not None):
+            raise ValueError(
+                "sqlite_snapshots requires an engine and no connection, "
+                "session or scoped_session")
+        if statements is None:
+            statements = StatementCache()
+        self.statements = statements
         if scoped_session is None:
             scoped_session = Session
         self.Session = scoped_session
@@ -132,6 +206,12 @@ class SQLAlchemyFixture(DBLoadableFixture):
         if self.engine is not None and self.connection is None:
             self.connection = self.engine.connect()
         
+        if self.rollback_teardown and self.connection is None:
+            raise UninitializedError(
+                "Cannot load data in a transaction to roll back without a "
+                "connection.  Pass an engine or a connection to %s" % 
+                                                    self.__class__.__name__)
+        
         if self.session is None:
             if self.connection:
                 self.session = self.Session(bind=self.connection)
@@ -142,12 +222,18 @@ class SQLAlchemyFixture(DBLoadableFixture):
     
     def commit(self):
         """Commit the load transaction and flush the session
+        
+        With ``rollback_teardown`` the session is flushed but the transaction 
+        stays open until :meth:`unload`
         """
         if self.connection:
             # note that when not using a connection, calling session.commit() 
             # as the inheirted code does will automatically flush the session
             self.session.flush()
         
+        if self.rollback_teardown:
+            log.debug("not committing %s", self.transaction)
+            return
         log.debug("transaction.commit() <- %s", self.transaction)
         DBLoadableFixture.commit(self)
     
@@ -166,10 +252,70 @@ class SQLAlchemyFixture(DBLoadableFixture):
         log.debug("create_transaction() <- %s", transaction)
         return transaction
     
+    def create_savepoint(self):
+        """Begin a transaction and a SAVEPOINT inside it on the connection
+        
+        The code under test must use :attr:`connection`, or a session bound 
+        to it, for its changes to be rolled back.
+        
+        With SQLite, pysqlite must not begin and commit transactions itself 
+        or it commits before each SAVEPOINT, so the engine has to be created 
+        with ``connect_args={'isolation_level': None}``.  A ValueError is 
+        raised otherwise.
+        """
+        if self.connection is None:
+            raise UninitializedError(
+                "Cannot begin a savepoint without a connection.  Pass an "
+                "engine or a connection to %s" % self.__class__.__name__)
+        if (self.connection.dialect.name == 'sqlite' and getattr(
+                    self.connection.connection.connection, 'isolation_level', 
+                    None) is not None):
+            raise ValueError(
+                "Cannot begin a savepoint on a SQLite connection that begins "
+                "transactions itself.  Create the engine with "
+                "connect_args={'isolation_level': None}")
+        log.debug("connection.begin_nested()")
+        return SavepointTransaction(self.connection, self.session)
+    
+    def can_pipeline(self):
+        """True if the connection can be used from two threads at once
+        
+        This is the case when the DB-API module declares a ``threadsafety`` 
+        of 2 or more, i.e. not for SQLite.  Rows of a session without a 
+        connection are never prepared in another thread.
+        """
+        if self.connection is None:
+            return False
+        dbapi = self.connection.dialect.dbapi
+        return getattr(dbapi, 'threadsafety', 0) >= 2
+    
+    def create_worker(self):
+        """Returns a copy of this fixture with its own connection and session
+        
+        The connection is taken from ``engine`` and is kept open until 
+        :meth:`dispose`.  This returns None, so that data is loaded in a 
+        single transaction, unless an engine was passed without a 
+        connection, session or scoped_session.  It also returns None with 
+        ``rollback_teardown``, with ``sqlite_snapshots`` and when the DB-API 
+        module declares a ``threadsafety`` below 2 (i.e. SQLite or MySQLdb), 
+        since connections then cannot be shared between threads.
+        """
+        if (not self.shares_engine or self.rollback_teardown or 
+                self.sqlite_snapshots or 
+                getattr(self.engine.dialect.dbapi, 'threadsafety', 0) < 2):
+            return None
+        worker = copy.copy(self)
+        worker.connection = self.engine.connect()
+        worker.session = session_factory(bind=worker.connection)
+        worker.transaction = None
+        worker.savepoint = None
+        return worker
+    
     def dispose(self):
         """Dispose of this fixture instance entirely
         
-        Closes all connection, session, and transaction objects and calls engine.dispose()
+        Closes all connection, session, and transaction objects, including 
+        those of workers, and calls engine.dispose()
         
         After calling fixture.dispose() you cannot use the fixture instance.  
         Instead you have to create a new instance like::
@@ -177,8 +323,15 @@ class SQLAlchemyFixture(DBLoadableFixture):
             fixture = SQLAlchemyFixture(...)
         
         """
-        from fixture.dataset import dataset_registry
         dataset_registry.clear()
+        for empty, loaded, values in self.snapshots.values():
+            empty.remove()
+            loaded.remove()
+        self.snapshots = {}
+        for worker in self.worker_pool:
+            worker.session.close()
+            worker.connection.close()
+        self.worker_pool = []
         if self.connection:
             self.connection.close()
         if self.session:
@@ -188,9 +341,312 @@ class SQLAlchemyFixture(DBLoadableFixture):
         if self.engine:
             self.engine.dispose()
     
+    def load(self, data):
+        """Load data
+        
+        With ``sqlite_snapshots`` the data is only loaded the first time, see 
+        :class:`SQLiteSnapshot`.
+        """
+        if not self.sqlite_snapshots:
+            return DBLoadableFixture.load(self, data)
+        if self.engine.dialect.name != 'sqlite':
+            raise ValueError(
+                "sqlite_snapshots cannot be used with the %s dialect" % 
+                                                    self.engine.dialect.name)
+        datasets = list(data)
+        key = tuple([ds.__class__ for ds in datasets])
+        self._release_connection()
+        if key not in self.snapshots:
+            empty = SQLiteSnapshot(self.engine)
+            empty.save()
+            loaded, values = None, None
+            if self.snapshot_dir:
+                cache_path = os.path.join(self.snapshot_dir, 
+                                    self.snapshot_fingerprint(datasets))
+                loaded = SQLiteSnapshot(self.engine, path=cache_path)
+                values = loaded.load()
+            if values is None:
+                DBLoadableFixture.load(self, data)
+                values = {}
+                for ds in self.loaded.to_unload():
+                    store = ds.meta._stored_objects
+                    values[_class_key(ds.__class__)] = [
+                        (row_key, snapshot_values(store[pos])) 
+                            for row_key, pos in store._ds_key_map.items()]
+                self._release_connection()
+                if loaded is None:
+                    loaded = SQLiteSnapshot(self.engine)
+                loaded.save(values)
+                self.snapshots[key] = (empty, loaded, values)
+                for ds in self.loaded.to_unload():
+                    self._store_snapshot_rows(ds, values)
+                self.snapshot = self.snapshots[key]
+                return
+            self.snapshots[key] = (empty, loaded, values)
+        
+        empty, loaded, values = self.snapshots[key]
+        loaded.restore()
+        self.loaded = self.LoadQueue()
+        for ds, level in self.plan_load(datasets):
+            self.attach_storage_medium(ds)
+            self._store_snapshot_rows(ds, values)
+            self.loaded.register(ds, level)
+        self.snapshot = self.snapshots[key]
+    
+    def snapshot_fingerprint(self, datasets):
+        """Returns a hex digest of datasets, all datasets they reference and 
+        the schema of the database
+        
+        Used to name the snapshots saved in ``snapshot_dir``.  See 
+        :meth:`DataSet.fingerprint <fixture.dataset.DataSet.fingerprint>`
+        """
+        fingerprint = hashlib.sha1()
+        for ds, level in self.plan_load(datasets):
+            fingerprint.update("%s %s\n" % (ds.__class__.fingerprint(), 
+                        ds.meta.storable_name or 
+                            self.style.guess_storable_name(
+                                                    ds.__class__.__name__)))
+        raw_conn = self.engine.raw_connection()
+        try:
+            schema = raw_conn.connection.execute(
+                "SELECT type, name, sql FROM sqlite_master "
+                "ORDER BY type, name").fetchall()
+        finally:
+            raw_conn.close()
+        fingerprint.update(repr(schema))
+        fingerprint.update(
+                SQLiteSnapshot(self.engine).in_memory() and "memory" or "file")
+        return fingerprint.hexdigest()
+    
+    def _release_connection(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        Session.remove()
+        if not SQLiteSnapshot(self.engine).in_memory():
+            # a file must not be replaced under an open connection :
+            self.engine.dispose()
+    
+    def _store_snapshot_rows(self, ds, values):
+        ds.meta._stored_objects = DataSetStore(ds)
+        for row_key, row_values in values[_class_key(ds.__class__)]:
+            if isinstance(ds, StreamingDataSet):
+                ds.meta._stored_objects.store(row_key, SnapshotRow(row_values))
+                ds._setdata(row_key, None)
+                continue
+            row = getattr(ds, row_key)
+            if isinstance(row, TupleRow):
+                self.resolve_row_references(ds, row)
+            elif not isinstance(row, DataRow):
+                self.resolve_row_references(ds, row)
+                row = row(ds)
+            ds.meta._stored_objects.store(row_key, SnapshotRow(row_values))
+            ds._setdata(row_key, row)
+    
     def rollback(self):
         """Rollback load transaction"""
         DBLoadableFixture.rollback(self)
+    
+    def unload(self):
+        """Unload data
+        
+        With ``rollback_teardown`` this rolls back the transaction that the 
+        data was loaded in and with ``sqlite_snapshots`` this restores the 
+        database as it was before the first load.  Otherwise every loaded 
+        DataSet is unloaded.
+        """
+        if self.sqlite_snapshots and self.snapshot is not None:
+            empty, loaded, values = self.snapshot
+            self.snapshot = None
+            self._release_connection()
+            empty.restore()
+            self.loaded.clear()
+            dataset_registry.clear()
+            return
+        if not self.rollback_teardown:
+            return DBLoadableFixture.unload(self)
+        if self.loaded is None or self.transaction is None:
+            raise UninitializedError(
+                "Cannot unload data because it has not yet been loaded in this "
+                "process.  Call data.setup() before data.teardown()")
+        transaction, self.transaction = self.transaction, None
+        try:
+            # the session may have begun its own (sub)transaction :
+            self.session.rollback()
+            log.debug("transaction.rollback() <- %s", transaction)
+            transaction.rollback()
+        finally:
+            if hasattr(self.session, 'expunge_all'):
+                self.session.expunge_all()
+            else:
+                self.session.clear()
+            self.loaded.clear()
+            dataset_registry.clear()
+
+class SnapshotRow(object):
+    """The column values of a row restored from a :class:`SQLiteSnapshot`"""
+    def __init__(self, values):
+        self.__dict__.update(values)
+    
+    def __repr__(self):
+        return "<%s at %s %s>" % (
+                self.__class__.__name__, hex(id(self)), self.__dict__)
+
+def snapshot_values(obj):
+    """Returns a dict of the column values of a stored object"""
+    if isinstance(obj, LoadedTableRow):
+        return dict([(c.key, getattr(obj, c.key)) for c in obj.table.c])
+    if isinstance(obj, LoadedMappedRow):
+        return dict(obj.values)
+    from sqlalchemy.orm import object_mapper
+    from sqlalchemy.orm.properties import ColumnProperty
+    return dict([(prop.key, getattr(obj, prop.key)) 
+                    for prop in object_mapper(obj).iterate_properties 
+                        if isinstance(prop, ColumnProperty)])
+
+class SQLiteSnapshot(object):
+    """A copy of a SQLite database that can be restored later.
+    
+    A database file is copied as a whole.  The sqlite3 module of Python 2 
+    has no backup API so an in-memory database is saved as an SQL dump 
+    instead (see ``iterdump()``) and restored by dropping all of its tables 
+    and running the dump.
+    
+    The copy is saved to a temporary file unless path is given, in which 
+    case it is kept there along with the column values of the loaded rows.
+    
+    .. note:: Connections other than those of the engine should be closed 
+              when a database file is restored.
+    
+    """
+    def __init__(self, engine, path=None):
+        self.engine = engine
+        self.path = engine.url.database
+        self.copy = None
+        self.copy_path = path
+        self.temporary = path is None
+    
+    def in_memory(self):
+        return self.path in (None, '', ':memory:')
+    
+    def _paths(self):
+        return (self.copy_path + (self.in_memory() and '.sql' or '.sqlite'), 
+                self.copy_path + '.rows')
+    
+    def save(self, values=None):
+        """Save the current state of the database and optionally values, 
+        i.e. the column values of loaded rows
+        """
+        if self.in_memory():
+            raw_conn = self.engine.raw_connection()
+            try:
+                self.copy = "\n".join(raw_conn.connection.iterdump())
+            finally:
+                raw_conn.close()
+            if self.temporary:
+                return
+        elif self.temporary:
+            fd, self.copy = tempfile.mkstemp(suffix='.sqlite')
+            os.close(fd)
+            shutil.copyfile(self.path, self.copy)
+            return
+        
+        copy_path, values_path = self._paths()
+        if not self.in_memory():
+            _write_atomically(copy_path, 
+                              lambda f: shutil.copyfileobj(
+                                        open(self.path, 'rb'), f))
+            self.copy = copy_path
+        else:
+            _write_atomically(copy_path, 
+                              lambda f: f.write(self.copy.encode('utf-8')))
+        _write_atomically(values_path, 
+                          lambda f: pickle.dump(values, f, 2))
+    
+    def load(self):
+        """Use the copy that was saved at path earlier.
+        
+        Returns the values that were saved with it or None if there is no 
+        copy.
+        """
+        copy_path, values_path = self._paths()
+        if not (os.path.exists(copy_path) and os.path.exists(values_path)):
+            return None
+        try:
+            values = pickle.load(open(values_path, 'rb'))
+        except (EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            log.warning("could not read snapshot rows %s", values_path)
+            return None
+        if self.in_memory():
+            self.copy = open(copy_path, 'rb').read().decode('utf-8')
+        else:
+            self.copy = copy_path
+        return values
+    
+    def restore(self):
+        """Restore the database to the state it had when saved"""
+        if self.copy is None:
+            raise UninitializedError(
+                "Cannot restore %s because it was not saved" % self)
+        if not self.in_memory():
+            shutil.copyfile(self.copy, self.path)
+            return
+        raw_conn = self.engine.raw_connection()
+        try:
+            conn = raw_conn.connection
+            objects = conn.execute(
+                "SELECT type, name FROM sqlite_master WHERE type IN "
+                "('table', 'view') AND name NOT LIKE 'sqlite_%'").fetchall()
+            for obj_type, name in objects:
+                conn.execute('DROP %s "%s"' % (
+                                obj_type.upper(), name.replace('"', '""')))
+            conn.executescript(self.copy)
+        finally:
+            raw_conn.close()
+    
+    def remove(self):
+        """Remove a temporary copy"""
+        if self.temporary and self.copy is not None and not self.in_memory():
+            os.remove(self.copy)
+        self.copy = None
+
+def _write_atomically(path, write):
+    # so that concurrent processes never read a partial snapshot :
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.')
+    f = os.fdopen(fd, 'wb')
+    try:
+        write(f)
+    finally:
+        f.close()
+    os.rename(tmp_path, path)
+
+def _class_key(cls):
+    return "%s.%s" % (cls.__module__, cls.__name__)
+
+class SavepointTransaction(object):
+    """A SAVEPOINT within a transaction of connection.
+    
+    rollback() rolls back both and expires the objects of session so 
+    that they are reloaded from the database on next access.
+    """
+    def __init__(self, connection, session=None):
+        self.connection = connection
+        self.session = session
+        self.transaction = connection.begin()
+        self.savepoint = connection.begin_nested()
+    
+    def rollback(self):
+        try:
+            if self.savepoint.is_active:
+                self.savepoint.rollback()
+        finally:
+            if self.transaction.is_active:
+                self.transaction.rollback()
+            if self.session is not None and hasattr(self.session, 'expire_all'):
+                self.session.expire_all()
 
 ## this was used in an if branch of clear() ... but I think this is no longer necessary with scoped sessions
 ## does it need to exist for 0.4 ?  not sure
@@ -219,54 +675,291 @@ class MappedClassMedium(DBLoadableFixture.StorageMediumAdapter):
     """
     def __init__(self, *a,**kw):
         DBLoadableFixture.StorageMediumAdapter.__init__(self, *a,**kw)
+        self.bulk_mappings = False
+        self._property_keys = {}
+        # objects added to the session, by id() :
+        self._added = {}
         
     def clear(self, obj):
-        """Delete this object from the session"""
-        self.session.delete(obj)
+        """Delete this object from the session
+        
+        Rows inserted in bulk are deleted from the mapper's table directly.
+        """
+        self.clear_many([obj])
+    
+    def truncate(self):
+        """Empty the mapper's table, see :func:`truncate_table`
+        
+        Stored objects are expunged from the session.
+        """
+        from sqlalchemy.orm import class_mapper
+        mapper = class_mapper(self.medium)
+        for obj in self.dataset.meta._stored_objects:
+            if not isinstance(obj, LoadedMappedRow) and obj in self.session:
+                self.session.expunge(obj)
+        truncate_table(mapper.local_table, self.session.connection(mapper))
+    
+    def clear_many(self, objs):
+        """Delete objs from the session
+        
+        Rows inserted in bulk are deleted from the mapper's table with one 
+        statement per chunk of primary keys, see :func:`delete_many`
+        """
+        inserted_keys = []
+        for obj in objs:
+            if isinstance(obj, LoadedMappedRow):
+                inserted_keys.append(obj.primary_key)
+            else:
+                self.session.delete(obj)
+        if inserted_keys:
+            from sqlalchemy.orm import class_mapper
+            mapper = class_mapper(self.medium)
+            delete_many(mapper.local_table, inserted_keys, 
+                        self.session.connection(mapper), 
+                        pk_cols=mapper.primary_key, 
+                        statements=self.statements)
     
     def visit_loader(self, loader):
         """Visits the :class:`SQLAlchemyFixture` loader and stores a reference to its session"""
         self.session = loader.session
+        self.bulk_mappings = getattr(loader, 'bulk_mappings', False)
+        self.statements = getattr(loader, 'statements', None)
+        self._added = {}
         
     def save(self, row, column_vals):
         """Save a new object to the session if it doesn't already exist in the session."""
         obj = self.medium()
         for c, val in column_vals:
             setattr(obj, c, val)
-        if obj not in self.session.new:
+        if not self._was_added(obj):
             if hasattr(self.session, 'add'):
                 # sqlalchemy 0.5.2+
                 self.session.add(obj)
             else:
                 self.session.save(obj)
+            self._added[id(obj)] = obj
         return obj
+    
+    def save_many(self, rows):
+        """Save new objects for all rows to the session at once.
+        
+        Objects that already exist in the session are not added again.  If 
+        the loader was configured with ``bulk_mappings`` then rows are 
+        inserted into the mapper's table instead, see :meth:`insert_mappings` 
+        (unless the class inherits from another mapped class).
+        
+        Objects of a :class:`StreamingDataSet 
+        <fixture.dataset.StreamingDataSet>` are flushed right away and 
+        neither the session nor this medium keeps them, see 
+        :meth:`flush_streamed`.
+        """
+        if self.bulk_mappings and not is_inherited_mapper(self.medium):
+            return self.insert_mappings(rows)
+        objs = []
+        for row, column_vals in rows:
+            obj = self.medium()
+            for c, val in column_vals:
+                setattr(obj, c, val)
+            objs.append(obj)
+        unsaved = [obj for obj in objs if not self._was_added(obj)]
+        if hasattr(self.session, 'add_all'):
+            # sqlalchemy 0.5+
+            self.session.add_all(unsaved)
+        else:
+            for obj in unsaved:
+                self.session.save(obj)
+        for obj in unsaved:
+            self._added[id(obj)] = obj
+        if (isinstance(self.dataset, StreamingDataSet) and 
+                                    not is_inherited_mapper(self.medium)):
+            return self.flush_streamed(objs)
+        return objs
+    
+    def flush_streamed(self, objs):
+        """Flush objs and return a :class:`LoadedMappedRow` for each of them.
+        
+        objs are then expunged from the session so that memory does not grow 
+        with every chunk of a streamed DataSet.  They are unloaded by primary 
+        key like rows inserted in bulk.
+        """
+        from sqlalchemy.orm import class_mapper
+        mapper = class_mapper(self.medium)
+        self.session.flush()
+        stored = []
+        for obj in objs:
+            stored.append(LoadedMappedRow(
+                    mapper, mapper.primary_key_from_instance(obj), 
+                    snapshot_values(obj)))
+            self.session.expunge(obj)
+            self._added.pop(id(obj), None)
+        return stored
+    
+    def _was_added(self, obj):
+        """True if obj was already added to the session.
+        
+        Note that ``obj in session.new`` would build a set of all pending 
+        objects each time, making a load quadratic in the number of rows.
+        """
+        if id(obj) in self._added:
+            return True
+        # i.e. Session.mapper() saves new objects when they are created :
+        return obj in self.session
 
+    
+    def insert_mappings(self, rows):
+        """Insert rows into the mapper's table without creating objects.
+        
+        Column names are translated from mapped attributes to table columns 
+        and many-to-one relations are resolved to the values of their 
+        foreign key columns.  Returns a :class:`LoadedMappedRow` for each 
+        row.
+        """
+        from sqlalchemy.orm import class_mapper
+        mapper = class_mapper(self.medium)
+        # objects pending in the session might be referenced by foreign keys :
+        self.session.flush()
+        conn = self.session.connection(mapper)
+        
+        stored = [None] * len(rows)
+        # consecutive rows with the same columns, inserted together so that 
+        # generated keys follow the order of rows :
+        batches = []
+        for i, (row, column_vals) in enumerate(rows):
+            values = dict(list(column_vals))
+            params = {}
+            for name, val in values.items():
+                prop = mapper.get_property(name)
+                if hasattr(prop, 'columns'):
+                    params[prop.columns[0].key] = val
+                elif getattr(prop, 'local_remote_pairs', None) and not prop.uselist:
+                    for local_col, remote_col in prop.local_remote_pairs:
+                        if val is None:
+                            params[local_col.key] = None
+                        else:
+                            related_key = self._property_key(
+                                                    prop.mapper, remote_col)
+                            params[local_col.key] = getattr(val, related_key)
+                else:
+                    raise ValueError(
+                        "cannot insert %s.%s in bulk, only columns and "
+                        "many-to-one relations are supported (try "
+                        "bulk_mappings=False)" % (
+                                        self.medium.__name__, name))
+            for col in mapper.primary_key:
+                if col.key in params and params[col.key] is None:
+                    # let the database generate it :
+                    del params[col.key]
+            signature = sorted(params.keys())
+            if not batches or batches[-1][0] != signature:
+                batches.append((signature, []))
+            batches[-1][1].append((i, values, params))
+        
+        table = mapper.local_table
+        for signature, batch in batches:
+            inserted_keys = insert_many(
+                        table, [params for i, values, params in batch], conn,
+                        statements=self.statements)
+            for (i, values, params), primary_key in zip(batch, inserted_keys):
+                for col, val in zip(mapper.primary_key, primary_key):
+                    values[self._property_key(mapper, col)] = val
+                stored[i] = LoadedMappedRow(mapper, primary_key, values)
+        return stored
+    
+    def _property_key(self, mapper, column):
+        if mapper not in self._property_keys:
+            self._property_keys[mapper] = dict([(col, prop.key) 
+                            for prop in mapper.iterate_properties 
+                                for col in getattr(prop, 'columns', [])])
+        return self._property_keys[mapper][column]
+
+class LoadedMappedRow(object):
+    """A row of a mapped class that was inserted in bulk.
+    
+    Attributes are the values of the mapped properties that were inserted, 
+    including the primary key.
+    """
+    def __init__(self, mapper, primary_key, values):
+        self.mapper = mapper
+        self.primary_key = [k for k in primary_key]
+        self.values = values
+    
+    def __getattr__(self, name):
+        try:
+            return self.values[name]
+        except KeyError:
+            raise AttributeError(
+                "%s for %s has no attribute '%s'" % (
+                    self.__class__.__name__, self.mapper, name))
+    
+    def __repr__(self):
+        return "<%s %s %s>" % (
+                self.__class__.__name__, self.mapper.class_.__name__, 
+                self.primary_key)
 
 class LoadedTableRow(object):
-    def __init__(self, table, inserted_key, conn):
+    """A row inserted into table, identified by inserted_key.
+    
+    Column values are selected on first attribute access together with all 
+    other unfetched rows of the same :class:`LoadedRowBatch`.
+    """
+    def __init__(self, table, inserted_key, conn, batch=None, row=None):
         self.table = table
         self.conn = conn
         self.inserted_key = [k for k in inserted_key]
-        self.row = None
+        self.row = row
+        if batch is None:
+            batch = LoadedRowBatch(table, conn)
+        self.batch = batch
+        if row is None:
+            batch.add(self)
     
     def __getattr__(self, col):
-        if not self.row:
-            if len(self.inserted_key) > 1:
-                raise NotImplementedError(
-                    "%s does not support making a select statement with a "
-                    "composite key, %s.  This is probably fixable" % (
-                                        self.__class__.__name__, 
-                                        self.table.primary_key))
-            
-            first_pk = [k for k in self.table.primary_key][0]
-            id = getattr(self.table.c, first_pk.key)
-            stmt = self.table.select(id==self.inserted_key[0])
-            if self.conn:
-                c = self.conn.execute(stmt)
-            else:
-                c = stmt.execute()
-            self.row = c.fetchone()
+        if col.startswith('__'):
+            raise AttributeError(col)
+        if self.row is None:
+            self.batch.fetch()
+            if self.row is None:
+                raise LookupError(
+                    "no row with primary key %s in table %s" % (
+                                            self.inserted_key, self.table))
         return getattr(self.row, col)
+
+class LoadedRowBatch(object):
+    """Rows of one table that are selected together.
+    
+    Instead of one SELECT per :class:`LoadedTableRow` all rows added since 
+    the last fetch are selected with one statement per chunk_size keys, or 
+    fewer for a composite key, see :func:`key_criterion` and 
+    :func:`keys_per_statement`.
+    """
+    def __init__(self, table, conn=None, chunk_size=500, statements=None):
+        self.table = table
+        self.conn = conn
+        self.chunk_size = chunk_size
+        if statements is None:
+            statements = StatementCache()
+        self.statements = statements
+        self.unfetched = []
+    
+    def add(self, loaded_row):
+        self.unfetched.append(loaded_row)
+    
+    def fetch(self):
+        """Selects the values of all unfetched rows."""
+        unfetched, self.unfetched = self.unfetched, []
+        pk_cols = [k for k in self.table.primary_key]
+        by_key = {}
+        for loaded_row in unfetched:
+            by_key[tuple(loaded_row.inserted_key)] = loaded_row
+        chunk_size = keys_per_statement(pk_cols, self.chunk_size)
+        for i in range(0, len(unfetched), chunk_size):
+            keys = [r.inserted_key for r in unfetched[i:i+chunk_size]]
+            stmt = self.statements.select(self.table, self.conn, len(keys))
+            params = key_params(keys)
+            for row in _execute(stmt, self.conn, params).fetchall():
+                key = tuple([row[c] for c in pk_cols])
+                if key in by_key:
+                    by_key[key].row = row
              
 class TableMedium(DBLoadableFixture.StorageMediumAdapter):
     """
@@ -285,20 +978,43 @@ class TableMedium(DBLoadableFixture.StorageMediumAdapter):
     def __init__(self, *a,**kw):
         DBLoadableFixture.StorageMediumAdapter.__init__(self, *a,**kw)
         self.conn = None
+        self.batch = None
+        self.statements = None
         
     def clear(self, obj):
-        """Constructs a delete statement per each primary key and 
+        """Constructs a delete statement for the primary key and 
         executes it either explicitly or implicitly
         """
-        i=0
-        for k in obj.table.primary_key:
-            id = getattr(obj.table.c, k.key)
-            stmt = obj.table.delete(id==obj.inserted_key[i])
-            if self.conn:
-                c = self.conn.execute(stmt)
-            else:
-                c = stmt.execute()
-            i+=1
+        self.clear_many([obj])
+    
+    def clear_many(self, objs):
+        """Deletes objs with one statement per table and chunk of 
+        primary keys, see :func:`delete_many`
+        """
+        tables = []
+        keys = {}
+        for obj in objs:
+            if obj.table not in keys:
+                keys[obj.table] = []
+                tables.append(obj.table)
+            keys[obj.table].append(obj.inserted_key)
+        for table in tables:
+            delete_many(table, keys[table], self.conn, 
+                        statements=self.statements)
+    
+    def fetch_stored_objects(self):
+        """Selects the values of all rows inserted so far, see 
+        :class:`LoadedRowBatch`
+        
+        Only the last chunk of a :class:`StreamingDataSet 
+        <fixture.dataset.StreamingDataSet>` is selected, see :meth:`save_many`.
+        """
+        if self.batch is not None:
+            self.batch.fetch()
+    
+    def truncate(self):
+        """Empty the table, see :func:`truncate_table`"""
+        truncate_table(self.medium, self.conn)
     
     def visit_loader(self, loader):
         """Visits the :class:`SQLAlchemyFixture` loader and stores a reference 
@@ -308,6 +1024,8 @@ class TableMedium(DBLoadableFixture.StorageMediumAdapter):
             self.conn = loader.connection
         else:
             self.conn = None
+        self.batch = None
+        self.statements = getattr(loader, 'statements', None)
         
     def save(self, row, column_vals):
         """Constructs an insert statement with the given values and 
@@ -318,18 +1036,16 @@ class TableMedium(DBLoadableFixture.StorageMediumAdapter):
             raise ValueError(
                 "medium %s must be a Table instance" % self.medium)
                 
-        stmt = self.medium.insert()
         params = dict(list(column_vals))
+        if self.statements is None:
+            stmt = self.medium.insert()
+        else:
+            stmt = self.statements.insert(self.medium, self.conn, params.keys())
         if self.conn:
             c = self.conn.execute(stmt, params)
         else:
             c = stmt.execute(params)
-
-        # In SQLAlchemy 0.8 this changed to a property with another name
-        if hasattr(c, "primary_key"):
-            primary_key = c.primary_key
-        else:
-            primary_key = c.last_inserted_ids()
+        primary_key = inserted_primary_key(c)
 
         if primary_key is None:
             raise NotImplementedError(
@@ -341,7 +1057,337 @@ class TableMedium(DBLoadableFixture.StorageMediumAdapter):
                 "expected primary_key %s, got %s (using table %s)" % (
                                 table_keys, inserted_keys, self.medium))
         
-        return LoadedTableRow(self.medium, primary_key, self.conn)
+        return self._loaded_row(primary_key)
+    
+    def _loaded_row(self, primary_key, row=None):
+        if self.batch is None:
+            self.batch = LoadedRowBatch(self.medium, self.conn, 
+                                        statements=self.statements)
+        return LoadedTableRow(self.medium, primary_key, self.conn, 
+                              batch=self.batch, row=row)
+    
+    def save_many(self, rows):
+        """Inserts rows with one executemany() call per run of consecutive 
+        rows that have the same columns.
+        
+        Rows that do not declare their primary key get it back from the 
+        database, see :func:`insert_many`.  When that is not possible with 
+        one statement (see :func:`can_insert_many`) those rows are saved one 
+        by one with :meth:`save`.
+        
+        The returned rows are fetched lazily with one SELECT for all rows of 
+        the dataset, see :class:`LoadedRowBatch`, unless RETURNING already 
+        sent them back.  Rows of a :class:`StreamingDataSet 
+        <fixture.dataset.StreamingDataSet>` are fetched one chunk at a time 
+        instead, so that the rows of a stream are never all kept at once.
+        """
+        from sqlalchemy.schema import Table
+        if not isinstance(self.medium, Table):
+            raise ValueError(
+                "medium %s must be a Table instance" % self.medium)
+        if isinstance(self.dataset, StreamingDataSet):
+            self.batch = None
+        
+        table_keys = [k.key for k in self.medium.primary_key]
+        can_generate_keys = can_insert_many(self.medium, self.conn)
+        stored = []
+        # consecutive rows with the same columns, inserted together so that 
+        # generated keys follow the order of rows :
+        batch = []
+        for row, column_vals in rows:
+            params = dict(list(column_vals))
+            missing_keys = [k for k in table_keys if params.get(k) is None]
+            if not table_keys or (missing_keys and not can_generate_keys):
+                stored.extend(self._insert_batch(batch))
+                batch = []
+                stored.append(self.save(row, params.items()))
+                continue
+            for k in missing_keys:
+                # let the database generate it :
+                params.pop(k, None)
+            if batch and sorted(batch[0].keys()) != sorted(params.keys()):
+                stored.extend(self._insert_batch(batch))
+                batch = []
+            batch.append(params)
+        stored.extend(self._insert_batch(batch))
+        return stored
+    
+    def _insert_batch(self, batch):
+        inserted_rows = []
+        inserted_keys = insert_many(self.medium, batch, self.conn, 
+                        returned_rows=inserted_rows, statements=self.statements)
+        if not inserted_rows:
+            inserted_rows = [None] * len(inserted_keys)
+        return [self._loaded_row(primary_key, row=inserted_row) for 
+                    primary_key, inserted_row in zip(inserted_keys, inserted_rows)]
+
+    def save_columns(self, rows, columns):
+        """Inserts the column values of rows with one executemany() call.
+        
+        When the values do not include the whole primary key, rows are saved 
+        with :meth:`save_many` instead.
+        """
+        from sqlalchemy.schema import Table
+        if not isinstance(self.medium, Table):
+            raise ValueError(
+                "medium %s must be a Table instance" % self.medium)
+        values_by_name = dict(columns)
+        table_keys = [k.key for k in self.medium.primary_key]
+        if not table_keys or [k for k in table_keys if 
+                        k not in values_by_name or None in values_by_name[k]]:
+            return DBLoadableFixture.StorageMediumAdapter.save_columns(
+                                                        self, rows, columns)
+        names = [name for name, values in columns]
+        multiparams = [dict(zip(names, values)) for values in 
+                            zip(*[values for name, values in columns])]
+        inserted_keys = insert_many(self.medium, multiparams, self.conn, 
+                                    statements=self.statements)
+        return [self._loaded_row(primary_key) for primary_key in inserted_keys]
+
+def _execute(stmt, conn, *multiparams):
+    if conn:
+        return conn.execute(stmt, *multiparams)
+    else:
+        return stmt.execute(*multiparams)
+
+def _dialect(table, conn):
+    if conn:
+        return conn.dialect
+    if table.bind is not None:
+        return table.bind.dialect
+    return None
+
+def supports_returning(dialect):
+    """True if a multi-row INSERT .. RETURNING can be sent with dialect."""
+    return (sa_major >= 0.8 and dialect is not None and 
+            getattr(dialect, 'implicit_returning', False) and 
+            getattr(dialect, 'supports_multivalues_insert', False))
+
+def can_insert_many(table, conn=None):
+    """True if :func:`insert_many` can return generated keys for table with 
+    one statement.
+    
+    This is the case when the dialect supports RETURNING or, with SQLite, 
+    when the table has a single integer primary key.  Other databases may 
+    generate keys from a sequence that is below keys already in the table.
+    """
+    from sqlalchemy.types import Integer
+    dialect = _dialect(table, conn)
+    if supports_returning(dialect):
+        return True
+    if dialect is None or dialect.name != 'sqlite':
+        return False
+    pk_cols = [k for k in table.primary_key]
+    return len(pk_cols) == 1 and isinstance(pk_cols[0].type, Integer)
+
+def inserted_primary_key(result):
+    """Returns the primary key of the row inserted by result, or None"""
+    # In SQLAlchemy 0.8 this changed to a property with another name
+    if hasattr(result, "inserted_primary_key"):
+        return result.inserted_primary_key
+    if hasattr(result, "primary_key"):
+        return result.primary_key
+    return result.last_inserted_ids()
+
+def key_criterion(pk_cols, keys, dialect=None):
+    """Returns a clause matching the rows whose primary key is in keys.
+    
+    pk_cols are the primary key columns and each key is a list of values 
+    for them.  Composite keys are matched with a tuple IN where the dialect 
+    supports it and with OR'ed equality otherwise.
+    """
+    from sqlalchemy import and_, or_
+    if len(pk_cols) == 1:
+        return pk_cols[0].in_([k[0] for k in keys])
+    if (sa_major >= 0.6 and dialect is not None and 
+                            dialect.name not in ('sqlite', 'mssql')):
+        from sqlalchemy import tuple_
+        return tuple_(*pk_cols).in_([tuple(k) for k in keys])
+    return or_(*[and_(*[c==v for c, v in zip(pk_cols, k)]) for k in keys])
+
+# SQLite before 3.32 binds no more than 999 values per statement :
+MAX_KEY_PARAMS = 999
+
+def keys_per_statement(pk_cols, chunk_size):
+    """Returns how many keys of pk_cols, at most chunk_size, one statement 
+    matches without binding more than ``MAX_KEY_PARAMS`` values.
+    """
+    return max(1, min(chunk_size, MAX_KEY_PARAMS // len(pk_cols)))
+
+def key_params(keys):
+    """Returns the bind parameters for keys in a statement of 
+    :class:`StatementCache`
+    """
+    params = {}
+    for i, key in enumerate(keys):
+        for j, value in enumerate(key):
+            params[_key_param_name(i, j)] = value
+    return params
+
+def _key_param_name(i, j):
+    return "_fixture_key_%s_%s" % (i, j)
+
+class StatementCache(object):
+    """Insert, delete and select statements built and compiled once.
+    
+    Statements are cached per table and column signature, i.e. the inserted 
+    columns or the number of primary keys to delete or select.  Primary key 
+    values are bound with :func:`key_params`.  Statements are compiled for 
+    the connection they are first executed with, so a cache should only be 
+    shared by fixtures that use the same kind of database.
+    """
+    def __init__(self):
+        self.statements = {}
+    
+    def __len__(self):
+        return len(self.statements)
+    
+    def clear(self):
+        self.statements.clear()
+    
+    def insert(self, table, conn, column_keys):
+        """Returns an insert statement for the columns column_keys"""
+        column_keys = tuple(sorted(column_keys))
+        def build(dialect):
+            return table.insert()
+        return self._compiled(('insert', table, column_keys), build, 
+                              table, conn, column_keys=list(column_keys))
+    
+    def delete(self, table, conn, num_keys, pk_cols=None):
+        """Returns a delete statement for num_keys primary keys"""
+        pk_cols = _pk_cols(table, pk_cols)
+        def build(dialect):
+            return table.delete(
+                    _key_criterion_params(pk_cols, num_keys, dialect))
+        return self._compiled(('delete', table, tuple(pk_cols), num_keys), 
+                              build, table, conn)
+    
+    def select(self, table, conn, num_keys, pk_cols=None):
+        """Returns a select statement for num_keys primary keys"""
+        pk_cols = _pk_cols(table, pk_cols)
+        def build(dialect):
+            return table.select(
+                    _key_criterion_params(pk_cols, num_keys, dialect))
+        return self._compiled(('select', table, tuple(pk_cols), num_keys), 
+                              build, table, conn)
+    
+    def _compiled(self, key, build, table, conn, column_keys=None):
+        if key in self.statements:
+            return self.statements[key]
+        stmt = build(_dialect(table, conn))
+        if conn:
+            compiled = stmt.compile(dialect=conn.dialect, 
+                                    column_keys=column_keys)
+        elif table.bind is not None:
+            compiled = stmt.compile(bind=table.bind, column_keys=column_keys)
+        else:
+            # nothing to compile for, it will fail when executed anyway
+            return stmt
+        self.statements[key] = compiled
+        return compiled
+
+def _pk_cols(table, pk_cols=None):
+    if pk_cols is None:
+        pk_cols = [k for k in table.primary_key]
+    return [k for k in pk_cols]
+
+def _key_criterion_params(pk_cols, num_keys, dialect):
+    from sqlalchemy.sql import bindparam
+    keys = [[bindparam(_key_param_name(i, j)) for j in range(len(pk_cols))] 
+                                                    for i in range(num_keys)]
+    return key_criterion(pk_cols, keys, dialect)
+
+def delete_many(table, keys, conn=None, pk_cols=None, chunk_size=500, 
+                statements=None):
+    """Deletes the rows of table whose primary key is in keys.
+    
+    One DELETE statement is executed per chunk_size keys, or fewer for a 
+    composite key, see :func:`key_criterion` and :func:`keys_per_statement`.  
+    The primary key columns default to those of table.  Statements are 
+    taken from statements, a :class:`StatementCache`, if there is one.
+    """
+    if statements is None:
+        statements = StatementCache()
+    chunk_size = keys_per_statement(_pk_cols(table, pk_cols), chunk_size)
+    for i in range(0, len(keys), chunk_size):
+        chunk = keys[i:i+chunk_size]
+        stmt = statements.delete(table, conn, len(chunk), pk_cols=pk_cols)
+        _execute(stmt, conn, key_params(chunk))
+
+def truncate_table(table, conn=None):
+    """Deletes all rows of table.
+    
+    This executes ``TRUNCATE TABLE .. CASCADE`` on PostgreSQL and an 
+    unqualified ``DELETE FROM`` everywhere else (i.e. SQLite).  Other 
+    dialects refuse to truncate a table that is referenced by a foreign key 
+    even when the referencing tables are empty.
+    """
+    dialect = _dialect(table, conn)
+    if dialect is not None and dialect.name in ('postgres', 'postgresql'):
+        from sqlalchemy.sql import text
+        stmt = text("TRUNCATE TABLE %s CASCADE" % 
+                            dialect.identifier_preparer.format_table(table))
+        (conn or table.bind).execute(stmt)
+    else:
+        _execute(table.delete(), conn)
+
+def insert_many(table, multiparams, conn=None, returned_rows=None, 
+                statements=None):
+    """Inserts multiparams, a list of dicts having the same keys, into table.
+    
+    If the primary key was declared then all rows are sent with one 
+    executemany() call.  Otherwise generated keys are read back either with 
+    RETURNING, when the dialect supports it, or, with SQLite, with one SELECT 
+    of the keys greater than the highest key that existed before the insert.  
+    Other databases get one INSERT per row (see :func:`can_insert_many`).
+    
+    Returns a list of primary key values for each row, in order.  When 
+    RETURNING is used and returned_rows is a list, the complete inserted rows 
+    are appended to it as well.  Insert statements are taken from 
+    statements, a :class:`StatementCache`, if there is one.
+    """
+    from sqlalchemy import select, func
+    pk_cols = [k for k in table.primary_key]
+    if not multiparams:
+        return []
+    if statements is None:
+        statements = StatementCache()
+    first = multiparams[0]
+    insert = statements.insert(table, conn, first.keys())
+    if not [k for k in pk_cols if k.key not in first]:
+        _execute(insert, conn, multiparams)
+        return [[params[k.key] for k in pk_cols] for params in multiparams]
+    
+    if supports_returning(_dialect(table, conn)):
+        stmt = table.insert().values(multiparams).returning(*table.c)
+        rows = _execute(stmt, conn).fetchall()
+        if returned_rows is not None:
+            returned_rows.extend(rows)
+        return [[r[k] for k in pk_cols] for r in rows]
+    
+    if not can_insert_many(table, conn):
+        inserted_keys = []
+        for params in multiparams:
+            primary_key = inserted_primary_key(_execute(insert, conn, params))
+            if primary_key is None or None in primary_key:
+                raise NotImplementedError(
+                    "cannot read back generated keys %s of table %s" % (
+                                                            pk_cols, table))
+            inserted_keys.append([k for k in primary_key])
+        return inserted_keys
+    pk_col = pk_cols[0]
+    last_key = _execute(select([func.max(pk_col)]), conn).scalar()
+    _execute(insert, conn, multiparams)
+    stmt = select([pk_col]).order_by(pk_col)
+    if last_key is not None:
+        stmt = stmt.where(pk_col > last_key)
+    inserted_keys = [[r[0]] for r in _execute(stmt, conn).fetchall()]
+    if len(inserted_keys) != len(multiparams):
+        raise ValueError(
+            "expected %s new keys in table %s, found %s (was the table "
+            "modified by another connection?)" % (
+                        len(multiparams), table, len(inserted_keys)))
+    return inserted_keys
 
 def is_assigned_mapper(obj):
     import sqlalchemy
@@ -366,6 +1412,10 @@ def is_assigned_mapper(obj):
             
     return is_assigned(obj)
 
+def is_inherited_mapper(obj):
+    from sqlalchemy.orm import class_mapper
+    return class_mapper(obj).inherits is not None
+
 def is_mapped_class(obj):
     # hrrmmm, really?
     if sa_major < 0.5:
@@ -18,6 +18,20 @@ class StormMedium(DBLoadableFixture.StorageMediumAdapter):
         self.transaction.remove(obj)
 
     def save(self, row, column_vals):
+        obj = self._store(row, column_vals)
+        self.transaction.flush()
+        stlog.info("%s %s", obj, [(n,getattr(obj,n)) for n in row.columns()])
+        return obj
+
+    def save_many(self, rows):
+        """Add objects for all rows to the store and flush them together"""
+        objs = [self._store(row, column_vals) for row, column_vals in rows]
+        self.transaction.flush()
+        for (row, column_vals), obj in zip(rows, objs):
+            stlog.info("%s %s", obj, [(n,getattr(obj,n)) for n in row.columns()])
+        return objs
+
+    def _store(self, row, column_vals):
         from storm.info import get_cls_info
         from storm.locals import ReferenceSet, Store
 
@@ -51,9 +65,6 @@ class StormMedium(DBLoadableFixture.StorageMediumAdapter):
             else:
                 setattr(obj, n, v)
 
-        self.transaction.flush()
-        stlog.info("%s %s", obj, [(n,getattr(obj,n)) for n in row.columns()])
-
         return obj
 
     def visit_loader(self, loader):
@@ -58,6 +58,53 @@ class TestFixture:
         data.__exit__(None, None, None)
         eq_(mock_call_log[-1], (MockLoader, 'unload'))
     
+    @attr(unit=True)
+    def test_data_sets_up_and_tears_down_in_background(self):
+        import threading
+        done = []
+        called = threading.Event()
+        release = threading.Event()
+        threads = []
+        def callback(task):
+            done.append(task)
+            called.set()
+        class WaitingLoader(MockLoader):
+            def load(self, data):
+                threads.append(threading.currentThread())
+                release.wait(5)
+                MockLoader.load(self, data)
+            def unload(self):
+                threads.append(threading.currentThread())
+                MockLoader.unload(self)
+        fxt = Fixture(loader=WaitingLoader(), dataclass=StubSuperSet)
+        data = fxt.data(StubDataset1, StubDataset2)
+        task = data.setup_in_background(callback=callback)
+        eq_(task.done(), False)
+        eq_(task.wait(0.01), False)
+        release.set()
+        eq_(task.wait(), True)
+        # the callback is called right after :
+        called.wait(5)
+        eq_(done, [task])
+        eq_(mock_call_log[-1], (WaitingLoader, 'load', StubSuperSet))
+        data.teardown_in_background().wait()
+        eq_(mock_call_log[-1], (WaitingLoader, 'unload'))
+        # both ran in the same thread, which is not this one :
+        eq_(len(set(threads)), 1)
+        assert threads[0] is not threading.currentThread()
+        
+        fxt = Fixture(loader=AbusiveMockLoader(), dataclass=StubSuperSet)
+        data = fxt.data(StubDataset1, StubDataset2)
+        data.setup()
+        task = data.teardown_in_background()
+        try:
+            task.wait()
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("expected ValueError")
+        eq_(task.done(), True)
+    
     @attr(unit=True)
     def test_with_data_decorates_a_callable(self):
         @self.fxt.with_data(StubDataset1, StubDataset2)
@@ -2,7 +2,8 @@
 from nose.tools import with_setup, eq_, raises
 from fixture import DataSet
 from fixture.dataset import (
-    Ref, DataType, DataRow, SuperSet, MergedSuperSet, is_rowlike)
+    Ref, DataType, DataRow, TupleRow, SuperSet, MergedSuperSet, is_rowlike, 
+    ColumnarDataSet, ColumnarRow, StreamingDataSet, dataset_registry)
 from fixture.test import attr
 
 class Books(DataSet):
@@ -409,4 +410,310 @@ def test_DataSet_cant_add_refs_to_self():
     ds = Pals()
     eq_(ds.meta.references, [])
     
-        
\ No newline at end of file
+        
+class TestFingerprint(object):
+    
+    def datasets(self, name='truck'):
+        class CategoryData(DataSet):
+            class cars:
+                name = 'cars'
+        class ProductData(DataSet):
+            class truck:
+                name = 'truck'
+                category = CategoryData.cars
+                category_name = CategoryData.cars.ref('name')
+        ProductData.truck.name = name
+        return CategoryData, ProductData
+    
+    @attr(unit=True)
+    def test_same_content_has_same_fingerprint(self):
+        CategoryData, ProductData = self.datasets()
+        OtherCategoryData, OtherProductData = self.datasets()
+        eq_(ProductData.fingerprint(), OtherProductData.fingerprint())
+        eq_(len(ProductData.fingerprint()), 40)
+        assert ProductData.fingerprint() != CategoryData.fingerprint()
+        
+        ProductData, PickupData = self.datasets(name='pickup')
+        assert ProductData.fingerprint() != PickupData.fingerprint()
+    
+    @attr(unit=True)
+    def test_fingerprint_is_computed_once(self):
+        calls = []
+        class Counted(DataSet):
+            def data(self):
+                calls.append(1)
+                return (('one', dict(value=1)),)
+        digest = Counted.fingerprint()
+        eq_(Counted.fingerprint(), digest)
+        eq_(len(calls), 1)
+        
+        class Meta(DataSet.Meta):
+            storable_name = 'counted'
+        Counted.Meta = Meta
+        assert Counted.fingerprint() != digest
+        eq_(len(calls), 2)
+    
+    @attr(unit=True)
+    def test_referenced_changes_change_fingerprint(self):
+        CategoryData, ProductData = self.datasets()
+        digest = ProductData.fingerprint()
+        CategoryData.cars.name = 'trucks'
+        assert ProductData.fingerprint() != digest
+        digest = ProductData.fingerprint()
+        ProductData.truck.name = 'pickup'
+        assert ProductData.fingerprint() != digest
+
+class TestRowPlan(object):
+    
+    @attr(unit=True)
+    def test_rows_are_compiled_with_the_class(self):
+        class CategoryData(DataSet):
+            class cars:
+                name = 'cars'
+        class ProductData(DataSet):
+            class truck:
+                name = 'truck'
+                category = CategoryData.cars
+                category_id = CategoryData.cars.ref('id')
+                tags = ['big']
+        plan = ProductData.compile_rows()
+        assert plan is ProductData.compile_rows()
+        eq_(plan.references, (CategoryData,))
+        eq_(plan.rows, (('truck', ProductData.truck, 
+                        ('category', 'category_id', 'name', 'tags'), 
+                        ('category', 'category_id', 'tags')),))
+        
+        product = ProductData()
+        eq_(product.meta.references, [CategoryData])
+        eq_(list(product.truck.columns()), 
+            ['category', 'category_id', 'name', 'tags'])
+        eq_(product.truck._ref_columns, ('category', 'category_id', 'tags'))
+    
+    @attr(unit=True)
+    def test_plan_is_compiled_again_when_the_class_changes(self):
+        class ProductData(DataSet):
+            class truck:
+                name = 'truck'
+        plan = ProductData.compile_rows()
+        class van:
+            name = 'van'
+        ProductData.van = van
+        ProductData.decorate_row(van, 'van', (), {'_primary_key': ['id']})
+        assert ProductData.compile_rows() is not plan
+        eq_([row[0] for row in ProductData.compile_rows().rows], 
+            ['truck', 'van'])
+        
+        ProductData.truck.price = 10
+        eq_(ProductData().truck._columns, ('name', 'price'))
+        eq_(ProductData().truck.price, 10)
+    
+    @attr(unit=True)
+    def test_subclasses_see_changes_to_their_base(self):
+        class ProductData(DataSet):
+            class truck:
+                name = 'truck'
+        class MoreProductData(ProductData):
+            class van:
+                name = 'van'
+        plan = MoreProductData.compile_rows()
+        assert MoreProductData.compile_rows() is plan
+        ProductData.truck.price = 10
+        assert MoreProductData.compile_rows() is not plan
+        eq_(MoreProductData().truck._columns, ('name', 'price'))
+    
+    @attr(unit=True)
+    def test_data_style_columns(self):
+        class ProductData(DataSet):
+            def data(self):
+                return (('truck', dict(name='truck', _hidden=1)),)
+        product = ProductData()
+        eq_(list(product.truck.columns()), ['name'])
+        eq_(product.truck._ref_columns, None)
+
+class TestTupleRows(object):
+    
+    def setUp(self):
+        class Numbers(DataSet):
+            def data(self):
+                return [('n%s' % i, dict(value=i, name=str(i))) 
+                                                    for i in range(3)]
+        self.dataset_class = Numbers
+        self.dataset = Numbers()
+    
+    @attr(unit=True)
+    def test_rows_share_a_layout(self):
+        rows = [row for key, row in self.dataset]
+        for row in rows:
+            assert isinstance(row, TupleRow)
+            assert row._layout is rows[0]._layout
+            assert not hasattr(row, '__dict__')
+        eq_(list(rows[0].columns()), ['name', 'value'])
+        eq_(rows[2].value, 2)
+        eq_(rows[2]['name'], '2')
+        eq_(self.dataset.n1.__name__, 'n1')
+    
+    @attr(unit=True)
+    def test_unloaded_attributes(self):
+        assert not hasattr(self.dataset.n0, 'id')
+        self.dataset.n0.value = 10
+        eq_(self.dataset.n0.value, 10)
+        eq_(self.dataset.n1.value, 1)
+    
+    @attr(unit=True)
+    def test_ref(self):
+        ref = self.dataset.n1.ref
+        eq_(ref.dataset_class, self.dataset_class)
+        eq_(ref.key, 'n1')
+        eq_(ref('value').attr_name, 'value')
+
+class TestColumnarDataSet(object):
+    
+    @attr(unit=True)
+    def test_rows_are_views_of_columns(self):
+        class Numbers(ColumnarDataSet):
+            def data_columns(self):
+                return dict(value=range(100), 
+                            name=['n%s' % i for i in range(100)])
+        numbers = Numbers()
+        eq_(len(numbers), 100)
+        eq_(numbers.meta.column_names, ('name', 'value'))
+        assert not isinstance(numbers.meta.columns['value'], list)
+        eq_(numbers.row_42.value, 42)
+        eq_(numbers['row_42'].name, 'n42')
+        assert isinstance(numbers.row_42, ColumnarRow)
+        assert 'row_99' in numbers
+        assert 'row_100' not in numbers
+        eq_([(r._key, r.value) for r in numbers[10:13]], 
+            [('row_10', 10), ('row_11', 11), ('row_12', 12)])
+        eq_(list(numbers.row_1.columns()), ['name', 'value'])
+        chunks = list(numbers.column_chunks(40))
+        eq_([(start, stop) for start, stop, columns in chunks], 
+            [(0, 40), (40, 80), (80, 100)])
+        eq_(chunks[2][2][1], ('value', range(80, 100)))
+    
+    @attr(unit=True)
+    def test_key_column(self):
+        class Colors(ColumnarDataSet):
+            class Meta:
+                key_column = 'name'
+            def data_columns(self):
+                return dict(name=['red', 'blue'], hex=['f00', '00f'])
+        colors = Colors()
+        eq_(colors.blue.hex, '00f')
+        eq_([key for key, row in colors], ['red', 'blue'])
+    
+    @attr(unit=True)
+    @raises(ValueError)
+    def test_columns_must_have_the_same_length(self):
+        class Broken(ColumnarDataSet):
+            def data_columns(self):
+                return dict(a=[1, 2], b=[1])
+        Broken()
+
+class TestStreamingDataSet(object):
+    
+    @attr(unit=True)
+    def test_rows_are_generated_by_stream(self):
+        generated = []
+        class Numbers(StreamingDataSet):
+            def data(self):
+                for i in range(3):
+                    generated.append(i)
+                    yield ('n%s' % i, dict(value=i))
+        numbers = Numbers()
+        eq_(generated, [])
+        assert 'n0' not in numbers
+        rows = numbers.stream()
+        key, row = rows.next()
+        eq_((key, row.value), ('n0', 0))
+        assert isinstance(row, TupleRow)
+        eq_(generated, [0])
+        eq_([key for key, row in rows], ['n1', 'n2'])
+    
+    @attr(unit=True)
+    @raises(ValueError)
+    def test_keys_cannot_be_redeclared(self):
+        class Numbers(StreamingDataSet):
+            def data(self):
+                yield ('n', dict(value=1))
+                yield ('n', dict(value=2))
+        list(Numbers().stream())
+
+class TestFromRecords(object):
+    
+    @attr(unit=True)
+    def test_rows_are_made_from_records(self):
+        class CategoryData(DataSet):
+            class cars:
+                name = 'cars'
+        records = [dict(name='truck', category_id=CategoryData.cars.ref('id')), 
+                   dict(name='van', category_id=CategoryData.cars.ref('id'))]
+        ProductData = DataSet.from_records('ProductData', records, 
+                        key='name', references=[CategoryData], 
+                        meta=dict(storable_name='Product'))
+        eq_(ProductData.__name__, 'ProductData')
+        eq_(ProductData.__module__, __name__)
+        eq_(ProductData.Meta.storable_name, 'Product')
+        eq_(ProductData.Meta.references, [CategoryData])
+        assert issubclass(ProductData.Meta, DataSet.Meta)
+        
+        products = ProductData()
+        eq_([key for key, row in products], ['truck', 'van'])
+        assert isinstance(products.van, TupleRow)
+        eq_(products.van.name, 'van')
+        eq_(products.meta.references, [CategoryData])
+    
+    @attr(unit=True)
+    def test_keys(self):
+        Numbers = DataSet.from_records('Numbers', 
+                                    (dict(value=i) for i in range(3)))
+        eq_([key for key, row in Numbers()], ['row_0', 'row_1', 'row_2'])
+        Numbers = DataSet.from_records('Numbers', 
+                                    [dict(value=i) for i in range(3)], 
+                                    key=lambda r: 'n%s' % r['value'])
+        eq_(Numbers().n2.value, 2)
+    
+    @attr(unit=True)
+    @raises(ValueError)
+    def test_keys_cannot_be_redeclared(self):
+        DataSet.from_records('Numbers', [dict(v=1), dict(v=1)], key='v')
+    
+    @attr(unit=True)
+    def test_columnar_records(self):
+        Colors = ColumnarDataSet.from_records('Colors', 
+                    [dict(name='red', hex='f00'), dict(name='blue', hex='00f')], 
+                    key='name')
+        colors = Colors()
+        eq_(colors.meta.key_column, 'name')
+        eq_(colors.blue.hex, '00f')
+        eq_(len(colors), 2)
+
+class TestDataSetRegistry(object):
+    
+    def tearDown(self):
+        dataset_registry.clear()
+    
+    @attr(unit=True)
+    def test_shared_instances_are_kept_per_thread(self):
+        import threading
+        books = Books.shared_instance()
+        eq_(Books.shared_instance() is books, True)
+        other = []
+        def share():
+            other.append(Books.shared_instance())
+            dataset_registry.clear()
+        thread = threading.Thread(target=share)
+        thread.start()
+        thread.join()
+        assert other[0] is not books
+        eq_(Books in dataset_registry, True)
+        eq_(Books.shared_instance() is books, True)
+        
+        def share_registry(registry):
+            dataset_registry.activate(registry)
+            other.append(Books.shared_instance())
+        thread = threading.Thread(target=share_registry, 
+                                  args=(dataset_registry.current(),))
+        thread.start()
+        thread.join()
+        assert other[1] is books
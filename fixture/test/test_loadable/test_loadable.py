@@ -293,6 +293,7 @@ class StubLoadableFixture(DBLoadableFixture):
     def create_transaction(self):
         class NoTrans:
             def commit(self): pass
+            def rollback(self): pass
         return NoTrans()
 
 class MockStorageMedium(DBLoadableFixture.StorageMediumAdapter):
@@ -431,4 +432,638 @@ class TestDBLoadableRowReferences(object):
             ldr.loaded[PersonData].meta._stored_objects.get_object('bob')
         jenny_db_obj = \
             ldr.loaded[PersonData].meta._stored_objects.get_object('jenny')
-        eq_(jenny_db_obj.friend, bob_db_obj)
\ No newline at end of file
+        eq_(jenny_db_obj.friend, bob_db_obj)
+
+
+class TestDBLoadableChunks(object):
+    
+    def datasets(self):
+        class Person(object):
+            def save(self):
+                pass
+        class PersonData(DataSet):
+            def data(self):
+                return [('person_%s' % i, dict(name='Person %s' % i)) 
+                                                        for i in range(5)]
+        return Person, PersonData
+    
+    @attr(unit=True)
+    def test_rows_are_saved_in_chunks(self):
+        chunks = []
+        class ChunkedStorageMedium(MockStorageMedium):
+            def save_many(self, rows):
+                chunks.append([row._key for row, column_vals in rows])
+                return MockStorageMedium.save_many(self, rows)
+        Person, PersonData = self.datasets()
+        ldr = StubLoadableFixture(
+            style=NamedDataStyle(), medium=ChunkedStorageMedium, 
+            env=locals(), chunk_size=2)
+        ldr.begin()
+        ldr.load_dataset(PersonData())
+        
+        eq_([len(c) for c in chunks], [2, 2, 1])
+        stored = ldr.loaded[PersonData].meta._stored_objects
+        eq_(len(stored), 5)
+        eq_(stored.get_object('person_4').name, 'Person 4')
+    
+    @attr(unit=True)
+    def test_save_many_defaults_to_save(self):
+        saved = []
+        class SavingStorageMedium(MockStorageMedium):
+            def save(self, row, column_vals):
+                saved.append(row._key)
+                return MockStorageMedium.save(self, row, column_vals)
+        Person, PersonData = self.datasets()
+        ldr = StubLoadableFixture(
+            style=NamedDataStyle(), medium=SavingStorageMedium, env=locals())
+        ldr.begin()
+        ldr.load_dataset(PersonData())
+        
+        eq_(saved, ['person_%s' % i for i in range(5)])
+    
+    @attr(unit=True)
+    def test_referenced_rows_are_saved_first(self):
+        chunks = []
+        class ChunkedStorageMedium(MockStorageMedium):
+            def save_many(self, rows):
+                chunks.append([row._key for row, column_vals in rows])
+                return MockStorageMedium.save_many(self, rows)
+        class Person(object):
+            def save(self):
+                pass
+        class PersonData(DataSet):
+            class adam:
+                name = "Adam"
+            class bob:
+                name = "Bob"
+            class cain:
+                name = "Cain"
+            cain.father = adam
+            
+        ldr = StubLoadableFixture(
+            style=NamedDataStyle(), medium=ChunkedStorageMedium, env=locals())
+        ldr.begin()
+        ldr.load_dataset(PersonData())
+        
+        eq_(chunks, [['adam', 'bob'], ['cain']])
+        stored = ldr.loaded[PersonData].meta._stored_objects
+        eq_(stored.get_object('cain').father, stored.get_object('adam'))
+    
+    @attr(unit=True)
+    def test_rows_are_saved_in_a_pipeline(self):
+        import threading
+        chunks = []
+        class ChunkedStorageMedium(MockStorageMedium):
+            def save_many(self, rows):
+                chunks.append((len(rows), threading.currentThread()))
+                return MockStorageMedium.save_many(self, rows)
+        Person, PersonData = self.datasets()
+        ldr = StubLoadableFixture(
+            style=NamedDataStyle(), medium=ChunkedStorageMedium, 
+            env=locals(), chunk_size=2, pipeline=1)
+        ldr.begin()
+        ldr.load_dataset(PersonData())
+        
+        eq_([size for size, thread in chunks], [2, 2, 1])
+        for size, thread in chunks:
+            assert thread is not threading.currentThread()
+        stored = ldr.loaded[PersonData].meta._stored_objects
+        eq_(stored.get_object('person_4').name, 'Person 4')
+        
+        class Person(object):
+            def save(self):
+                pass
+        class PersonData(DataSet):
+            class adam:
+                name = "Adam"
+            class bob:
+                name = "Bob"
+            class cain:
+                name = "Cain"
+            cain.father = adam
+        del chunks[:]
+        ldr.env = locals()
+        ldr.load_dataset(PersonData())
+        eq_([size for size, thread in chunks], [2, 1])
+        stored = ldr.loaded[PersonData].meta._stored_objects
+        eq_(stored.get_object('cain').father, stored.get_object('adam'))
+    
+    @attr(unit=True)
+    def test_references_are_fetched_before_the_pipeline_starts(self):
+        events = []
+        class FetchingStorageMedium(MockStorageMedium):
+            def save_many(self, rows):
+                events.append(('save', self.dataset.__class__.__name__))
+                return MockStorageMedium.save_many(self, rows)
+            def fetch_stored_objects(self):
+                events.append(('fetch', self.dataset.__class__.__name__))
+        class Person(object):
+            def save(self):
+                pass
+        Pet = Person
+        class PersonData(DataSet):
+            class bob:
+                name = "Bob"
+        class PetData(DataSet):
+            class fido:
+                owner_name = PersonData.bob.ref('name')
+        ldr = StubLoadableFixture(
+            style=NamedDataStyle(), medium=FetchingStorageMedium, 
+            env=locals(), pipeline=1)
+        ldr.begin()
+        ldr.load_dataset(PetData())
+        
+        eq_(events, [('save', 'PersonData'), 
+                     ('fetch', 'PersonData'), ('save', 'PetData')])
+    
+    @attr(unit=True)
+    def test_rows_referencing_a_stream_are_not_pipelined(self):
+        import threading
+        from fixture.dataset import StreamingDataSet
+        threads = []
+        class ThreadMedium(MockStorageMedium):
+            def save_many(self, rows):
+                threads.append(threading.currentThread())
+                return MockStorageMedium.save_many(self, rows)
+        class Person(object):
+            def save(self):
+                pass
+        Pet = Person
+        class PersonData(StreamingDataSet):
+            def data(self):
+                yield ('bob', dict(name="Bob"))
+        class PetData(DataSet):
+            class Meta:
+                references = (PersonData,)
+            class fido:
+                owner = "bob"
+        ldr = StubLoadableFixture(
+            style=NamedDataStyle(), medium=ThreadMedium, 
+            env=locals(), pipeline=1)
+        ldr.begin()
+        ldr.load_dataset(PetData())
+        
+        eq_(len(threads), 2)
+        # only the stream itself is saved by the pipeline's thread :
+        assert threads[0] is not threading.currentThread()
+        assert threads[1] is threading.currentThread()
+    
+    @attr(unit=True)
+    def test_pipeline_errors_are_raised(self):
+        import threading
+        from fixture.exc import LoadError
+        class FailingStorageMedium(MockStorageMedium):
+            def save_many(self, rows):
+                if rows[0][0]._key == 'person_2':
+                    raise ValueError("cannot save %s" % rows[0][0]._key)
+                return MockStorageMedium.save_many(self, rows)
+        Person, PersonData = self.datasets()
+        ldr = StubLoadableFixture(
+            style=NamedDataStyle(), medium=FailingStorageMedium, 
+            env=locals(), chunk_size=2, pipeline=1)
+        ldr.begin()
+        num_threads = threading.activeCount()
+        try:
+            ldr.load_dataset(PersonData())
+        except LoadError, e:
+            assert "cannot save person_2" in str(e), str(e)
+            assert "rows 'person_2' to 'person_3'" in str(e), str(e)
+        else:
+            raise AssertionError("expected LoadError")
+        eq_(threading.activeCount(), num_threads)
+
+    @attr(unit=True)
+    def test_errors_name_the_row(self):
+        from fixture.exc import LoadError
+        class ResolvingLoadableFixture(StubLoadableFixture):
+            def resolve_stored_object(self, column_val):
+                if column_val == "Bob":
+                    raise ValueError("cannot resolve %s" % column_val)
+                return column_val
+        class Person(object):
+            def save(self):
+                pass
+        class PersonData(DataSet):
+            class adam:
+                name = "Adam"
+            class bob:
+                name = "Bob"
+        ldr = ResolvingLoadableFixture(
+            style=NamedDataStyle(), medium=MockStorageMedium, env=locals())
+        ldr.begin()
+        try:
+            ldr.load_dataset(PersonData())
+        except LoadError, e:
+            assert "cannot resolve Bob" in str(e), str(e)
+            assert "with 'bob' of " in str(e), str(e)
+        else:
+            raise AssertionError("expected LoadError")
+
+class TestStorageMediumClearMany(object):
+    
+    @attr(unit=True)
+    def test_clear_many_defaults_to_clear(self):
+        from fixture.exc import UnloadError
+        cleared = []
+        class ClearingMedium(MockStorageMedium):
+            def clear(self, obj):
+                if obj == 'broken':
+                    raise ValueError("cannot clear %s" % obj)
+                cleared.append(obj)
+        class SomeData(DataSet):
+            class some_row:
+                some_column = 'foo'
+        medium = ClearingMedium(None, SomeData())
+        medium.clear_many(['one', 'two'])
+        eq_(cleared, ['one', 'two'])
+        
+        try:
+            medium.clear_many(['three', 'broken', 'four'])
+        except UnloadError:
+            eq_(cleared, ['one', 'two', 'three'])
+        else:
+            assert False, "expected UnloadError"
+
+class TestDBLoadableUnloadStrategy(object):
+    
+    @attr(unit=True)
+    def test_truncate_strategy(self):
+        from fixture.loadable import TruncateStrategy
+        truncated = []
+        class Person(object):
+            def save(self):
+                pass
+        class TruncatingMedium(MockStorageMedium):
+            def clear(self, obj):
+                raise AssertionError("unexpected call to clear()")
+            def truncate(self):
+                truncated.append(self.dataset.__class__.__name__)
+        class PersonData(DataSet):
+            class bob:
+                name = "Bob"
+        class PetData(DataSet):
+            class fido:
+                owner = PersonData.bob
+        Pet = Person
+        ldr = StubLoadableFixture(
+            style=NamedDataStyle(), medium=TruncatingMedium, env=locals(), 
+            unload_strategy=TruncateStrategy())
+        data = ldr.data(PetData)
+        data.setup()
+        data.teardown()
+        eq_(truncated, ['PetData', 'PersonData'])
+
+def order_datasets():
+    """returns CategoryData, ProductData, CustomerData and OrderData.
+    
+    ProductData and CustomerData both reference CategoryData and are 
+    referenced by OrderData.
+    """
+    class CategoryData(DataSet):
+        class cars:
+            name = "cars"
+    class ProductData(DataSet):
+        class truck:
+            category = CategoryData.cars
+    class CustomerData(DataSet):
+        class bob:
+            favorite_category = CategoryData.cars
+    class OrderData(DataSet):
+        class bobs_truck:
+            product = ProductData.truck
+            customer = CustomerData.bob
+    return CategoryData, ProductData, CustomerData, OrderData
+
+class TestLoadPlan(object):
+    
+    def tearDown(self):
+        from fixture.dataset import dataset_registry
+        dataset_registry.clear()
+    
+    @attr(unit=True)
+    def test_diamond_references_are_planned_once(self):
+        CategoryData, ProductData, CustomerData, OrderData = order_datasets()
+        attached = []
+        class CountingFixture(StubLoadableFixture):
+            def attach_storage_medium(self, ds):
+                attached.append(ds.__class__.__name__)
+                StubLoadableFixture.attach_storage_medium(self, ds)
+        Category = Product = Customer = Order = Person = type(
+                        'Stored', (object,), {'save': lambda self: None})
+        ldr = CountingFixture(
+            style=NamedDataStyle(), medium=MockStorageMedium, env=locals())
+        plan = ldr.plan_load([OrderData()])
+        eq_([(ds.__class__.__name__, level) for ds, level in plan], 
+            [('CategoryData', 3), ('CustomerData', 2), ('ProductData', 2), 
+             ('OrderData', 1)])
+        
+        data = ldr.data(OrderData)
+        data.setup()
+        eq_(attached, 
+            ['CategoryData', 'CustomerData', 'ProductData', 'OrderData'])
+        eq_([ds.__class__.__name__ for ds in ldr.loaded.to_unload()], 
+            ['OrderData', 'CustomerData', 'ProductData', 'CategoryData'])
+    
+    @attr(unit=True)
+    def test_reference_cycles_are_detected(self):
+        from fixture.exc import ReferenceCycleError
+        CategoryData, ProductData, CustomerData, OrderData = order_datasets()
+        ldr = StubLoadableFixture(
+            style=NamedDataStyle(), medium=MockStorageMedium, env={})
+        order_data = OrderData.shared_instance()
+        category_data = CategoryData.shared_instance()
+        category_data.meta.references.append(OrderData)
+        try:
+            ldr.plan_load([order_data])
+        except ReferenceCycleError, e:
+            eq_(str(e), "datasets reference each other in a loop: "
+                "OrderData -> CustomerData -> CategoryData -> OrderData")
+        else:
+            raise AssertionError("expected ReferenceCycleError")
+    
+    @attr(unit=True)
+    def test_plans_are_cached_per_dataset_classes(self):
+        CategoryData, ProductData, CustomerData, OrderData = order_datasets()
+        walks = []
+        lookups = []
+        class CountingFixture(StubLoadableFixture):
+            def _walk_references(self, datasets, level):
+                walks.append([ds.__class__.__name__ for ds in datasets])
+                return StubLoadableFixture._walk_references(
+                                                    self, datasets, level)
+        class CountingEnv(dict):
+            def get(self, name, default=None):
+                lookups.append(name)
+                return dict.get(self, name, default)
+        class ClearingMedium(MockStorageMedium):
+            def clear(self, obj):
+                pass
+        Stored = type('Stored', (object,), {'save': lambda self: None})
+        env = CountingEnv(Category=Stored, Product=Stored, Customer=Stored, 
+                          Order=Stored)
+        ldr = CountingFixture(
+            style=NamedDataStyle(), medium=ClearingMedium, env=env)
+        for i in range(3):
+            data = ldr.data(OrderData)
+            data.setup()
+            eq_(data.OrderData.bobs_truck.product.category.name, "cars")
+            data.teardown()
+        eq_(walks, [['OrderData']])
+        eq_(sorted(lookups), ['Category', 'Customer', 'Order', 'Product'])
+        
+        ldr.clear_plans()
+        data = ldr.data(OrderData)
+        data.setup()
+        data.teardown()
+        eq_(walks, [['OrderData'], ['OrderData']])
+
+    @attr(unit=True)
+    def test_changed_rows_are_planned_again(self):
+        CategoryData, ProductData, CustomerData, OrderData = order_datasets()
+        class ClearingMedium(MockStorageMedium):
+            def clear(self, obj):
+                pass
+        Stored = type('Stored', (object,), {'save': lambda self: None})
+        env = dict(Category=Stored, Product=Stored, Customer=Stored,
+                   Order=Stored)
+        ldr = StubLoadableFixture(
+            style=NamedDataStyle(), medium=ClearingMedium, env=env)
+        data = ldr.data(ProductData)
+        data.setup()
+        data.teardown()
+
+        class OtherCategoryData(DataSet):
+            class boats:
+                name = "boats"
+        env['OtherCategory'] = Stored
+        ProductData.truck.price = 10
+        ProductData.truck.other_category = OtherCategoryData.boats
+        data = ldr.data(ProductData)
+        data.setup()
+        eq_(data.ProductData.truck.price, 10)
+        eq_(data.ProductData.truck.other_category.name, "boats")
+        data.teardown()
+
+class TestScopedFixtureData(object):
+    
+    @attr(unit=True)
+    def test_data_is_loaded_once_per_scope(self):
+        calls = []
+        class Person(object):
+            def save(self):
+                calls.append('save')
+        class Savepoint(object):
+            def rollback(self):
+                calls.append('rollback savepoint')
+        class SavepointFixture(StubLoadableFixture):
+            def create_savepoint(self):
+                calls.append('savepoint')
+                return Savepoint()
+        class ClearingMedium(MockStorageMedium):
+            def clear(self, obj):
+                calls.append('clear')
+        class PersonData(DataSet):
+            class bob:
+                name = "Bob"
+        ldr = SavepointFixture(
+            style=NamedDataStyle(), medium=ClearingMedium, env=locals())
+        data = ldr.data(PersonData)
+        data.setup_scope()
+        for i in range(2):
+            data.setup()
+            eq_(data.PersonData.bob.name, "Bob")
+            data.teardown()
+        data.teardown_scope()
+        eq_(calls, ['save', 'savepoint', 'rollback savepoint', 
+                    'savepoint', 'rollback savepoint', 'clear'])
+
+class TestParallelLoad(object):
+    
+    def setUp(self):
+        import copy, threading
+        self.events = []
+        self.fetched = []
+        # datasets that must be saved or cleared at once :
+        self.concurrent = set(['ProductData', 'CustomerData'])
+        events, concurrent = self.events, self.concurrent
+        fetched = self.fetched
+        lock = threading.Condition()
+        def record(event, name):
+            lock.acquire()
+            try:
+                events.append((event, name, threading.currentThread()))
+                lock.notifyAll()
+                seen = set([e[1] for e in events if e[0] == event])
+                if name in concurrent and not concurrent <= seen:
+                    lock.wait(5)
+            finally:
+                lock.release()
+        class Stored(object):
+            def save(self):
+                pass
+        class WaitingMedium(MockStorageMedium):
+            def save_many(self, rows):
+                name = self.dataset.__class__.__name__
+                if name == 'BrokenData':
+                    raise ValueError("cannot save %s" % name)
+                record('save', name)
+                return MockStorageMedium.save_many(self, rows)
+            def clear(self, obj):
+                record('clear', self.dataset.__class__.__name__)
+            def fetch_stored_objects(self):
+                fetched.append((self.dataset.__class__.__name__, 
+                                threading.currentThread()))
+        class ThreadedFixture(StubLoadableFixture):
+            def create_worker(self):
+                return copy.copy(self)
+        self.ldr = ThreadedFixture(
+            style=NamedDataStyle(), medium=WaitingMedium, workers=4, 
+            env=dict(Category=Stored, Product=Stored, Customer=Stored, 
+                     Order=Stored, Broken=Stored))
+    
+    def tearDown(self):
+        from fixture.dataset import dataset_registry
+        dataset_registry.clear()
+    
+    @attr(unit=True)
+    def test_datasets_of_a_level_are_loaded_at_once(self):
+        CategoryData, ProductData, CustomerData, OrderData = order_datasets()
+        data = self.ldr.data(OrderData)
+        data.setup()
+        eq_(data.OrderData.bobs_truck.product.category.name, "cars")
+        saved = [name for event, name, thread in self.events]
+        eq_(saved[0], 'CategoryData')
+        eq_(sorted(saved[1:3]), ['CustomerData', 'ProductData'])
+        eq_(saved[3], 'OrderData')
+        threads = dict([(name, thread) for event, name, thread in self.events])
+        assert threads['CustomerData'] is not threads['ProductData']
+        eq_(len(self.ldr.worker_pool), 2)
+        
+        data.teardown()
+    
+    @attr(unit=True)
+    def test_stored_objects_are_fetched_by_their_worker(self):
+        CategoryData, ProductData, CustomerData, OrderData = order_datasets()
+        data = self.ldr.data(OrderData)
+        data.setup()
+        saved_by = dict([(name, thread) for event, name, thread in self.events])
+        fetched_by = dict(self.fetched)
+        eq_(sorted(fetched_by.keys()), sorted(saved_by.keys()))
+        for name, thread in saved_by.items():
+            assert fetched_by[name] is thread, (
+                "%s was fetched in another thread" % name)
+        
+        data.teardown()
+    
+    @attr(unit=True)
+    def test_datasets_of_a_level_are_unloaded_at_once(self):
+        import threading
+        CategoryData, ProductData, CustomerData, OrderData = order_datasets()
+        data = self.ldr.data(OrderData)
+        data.setup()
+        del self.events[:]
+        data.teardown()
+        cleared = [name for event, name, thread in self.events]
+        eq_(cleared[0], 'OrderData')
+        eq_(sorted(cleared[1:3]), ['CustomerData', 'ProductData'])
+        eq_(cleared[3], 'CategoryData')
+        threads = dict([(name, thread) for event, name, thread in self.events])
+        assert threads['CustomerData'] is not threads['ProductData']
+        assert threads['OrderData'] is threading.currentThread()
+        
+        # a single worker unloads serially :
+        self.concurrent.clear()
+        data.setup()
+        del self.events[:]
+        self.ldr.workers = 1
+        data.teardown()
+        eq_(set([thread for event, name, thread in self.events]), 
+            set([threading.currentThread()]))
+    
+    @attr(unit=True)
+    def test_loaded_datasets_are_unloaded_after_an_error(self):
+        from fixture.exc import LoadError
+        CategoryData, ProductData, CustomerData, OrderData = order_datasets()
+        class BrokenData(DataSet):
+            class broken:
+                category = CategoryData.cars
+        self.concurrent.clear()
+        data = self.ldr.data(BrokenData, ProductData)
+        try:
+            data.setup()
+        except LoadError:
+            pass
+        else:
+            raise AssertionError("expected LoadError")
+        saved = [name for event, name, thread in self.events 
+                                                    if event == 'save']
+        cleared = [name for event, name, thread in self.events 
+                                                    if event == 'clear']
+        eq_(saved[0], 'CategoryData')
+        eq_(cleared[-1], 'CategoryData')
+        eq_(sorted(saved), sorted(cleared))
+        eq_(list(self.ldr.loaded.to_unload()), [])
+    
+    @attr(unit=True)
+    def test_fixtures_without_workers_load_serially(self):
+        CategoryData, ProductData, CustomerData, OrderData = order_datasets()
+        self.concurrent.clear()
+        self.ldr.create_worker = lambda: None
+        data = self.ldr.data(OrderData)
+        data.setup()
+        data.teardown()
+        eq_(len(set([thread for event, name, thread in self.events])), 1)
+        eq_(self.ldr.worker_pool, [])
+
+class TestConcurrentFixtures(object):
+    
+    @attr(unit=True)
+    def test_threads_load_the_same_datasets(self):
+        import threading
+        waiting = threading.Event()
+        loaded = threading.Event()
+        class PersonData(DataSet):
+            class bob:
+                name = "Bob"
+        class PetData(DataSet):
+            class fido:
+                owner_id = PersonData.bob.ref('id')
+        class WaitingMedium(MockStorageMedium):
+            def save_many(self, rows):
+                if (self.medium is Pet and 
+                        threading.currentThread().getName() == 'first'):
+                    # the other fixture loads everything in between :
+                    waiting.set()
+                    loaded.wait(5)
+                return MockStorageMedium.save_many(self, rows)
+        def person_class(id):
+            return type('Person', (object,), {
+                        'save': lambda self: setattr(self, 'id', id)})
+        Pet = type('Pet', (object,), {'save': lambda self: None})
+        first = StubLoadableFixture(
+            style=NamedDataStyle(), medium=WaitingMedium, 
+            env=dict(Person=person_class(1), Pet=Pet))
+        second = StubLoadableFixture(
+            style=NamedDataStyle(), medium=WaitingMedium, 
+            env=dict(Person=person_class(2), Pet=Pet))
+        loaded_data = {}
+        def load(name, fixture):
+            data = fixture.data(PetData)
+            data.setup()
+            loaded_data[name] = data
+        thread = threading.Thread(target=load, name='first', 
+                                  args=('first', first))
+        thread.start()
+        waiting.wait(5)
+        load('second', second)
+        loaded.set()
+        thread.join()
+        
+        def stored_pet(name):
+            stored = loaded_data[name].PetData.meta._stored_objects
+            return stored.get_object('fido')
+        eq_(stored_pet('first').owner_id, 1)
+        eq_(stored_pet('second').owner_id, 2)
+        assert loaded_data['first'].PetData is not loaded_data['second'].PetData
+        from fixture.dataset import dataset_registry
+        dataset_registry.clear()
@@ -1,12 +1,14 @@
 
+import os
 import unittest
 from nose.tools import eq_, raises
 from nose.exc import SkipTest
 from fixture import SQLAlchemyFixture
-from fixture.dataset import MergedSuperSet
+from fixture.dataset import MergedSuperSet, ColumnarDataSet, StreamingDataSet
 from fixture import (
     SQLAlchemyFixture, NamedDataStyle, CamelAndUndersStyle, TrimmedNameStyle)
 from fixture.exc import UninitializedError
+from fixture import TempIO
 from fixture.test import conf, env_supports, attr
 from fixture.test.test_loadable import *
 from fixture.examples.db.sqlalchemy_examples import *
@@ -627,3 +629,847 @@ def test_SQLAlchemyFixture_configured_with_bound_session_and_conn():
 #     import psycopg2.extensions
 #     self.conn.connection.connection.set_isolation_level(
 #             psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+
+def category_rows(numbers=None, with_ids=False):
+    """yields the key and values of a categories row for each number, 
+    1 to 5 by default
+    """
+    if numbers is None:
+        numbers = range(1, 6)
+    for i in numbers:
+        values = dict(name='Category %s' % i)
+        if with_ids:
+            values['id'] = i
+        yield ('category_%s' % i, values)
+
+class ChunkedCategoryTest(unittest.TestCase):
+    """loads CategoryData into categories two rows at a time"""
+    class CategoryData(DataSet):
+        def data(self):
+            return list(category_rows())
+    
+    def setUp(self):
+        self.engine = create_engine(conf.LITE_DSN)
+        metadata.bind = self.engine
+        metadata.create_all()
+        self.fixture = SQLAlchemyFixture(
+            env={'CategoryData':categories},
+            engine=metadata.bind,
+            chunk_size=2
+        )
+    
+    def tearDown(self):
+        metadata.drop_all()
+
+class TestTableObjectsSavedInChunks(ChunkedCategoryTest):
+    class CategoryData(DataSet):
+        def data(self):
+            return list(category_rows(with_ids=True))
+    
+    @attr(functional=1)
+    def test_setup_then_teardown(self):
+        data = self.fixture.data(self.CategoryData)
+        data.setup()
+        
+        rs = self.engine.execute(
+                    categories.select().order_by(categories.c.id)).fetchall()
+        eq_([(r.id, r.name) for r in rs], 
+            [(i, 'Category %s' % i) for i in range(1, 6)])
+        eq_(data.CategoryData.category_3.name, 'Category 3')
+        
+        data.teardown()
+        eq_(self.engine.execute(categories.select()).fetchall(), [])
+
+class TestTableObjectsGeneratedKeys(ChunkedCategoryTest):
+    
+    def setUp(self):
+        ChunkedCategoryTest.setUp(self)
+        self.engine.execute(categories.insert(), id=10, name='existing')
+    
+    @attr(unit=1)
+    def test_can_insert_many(self):
+        eq_(can_insert_many(categories), True)
+        class OtherDialect(object):
+            name = 'postgres'
+        class OtherConnection(object):
+            dialect = OtherDialect()
+        # keys generated by a sequence may be lower than existing keys :
+        eq_(can_insert_many(categories, OtherConnection()), False)
+    
+    @attr(functional=1)
+    def test_keys_follow_the_order_of_rows(self):
+        class AuthorData(DataSet):
+            class a:
+                first_name = 'A'
+            class b:
+                first_name = 'B'
+                last_name = 'Bee'
+            class c:
+                first_name = 'C'
+        fixture = SQLAlchemyFixture(
+            env={'AuthorData': authors}, engine=metadata.bind)
+        data = fixture.data(AuthorData)
+        data.setup()
+        
+        rs = self.engine.execute(
+                    authors.select().order_by(authors.c.id)).fetchall()
+        eq_([(r.id, r.first_name) for r in rs], [(1, 'A'), (2, 'B'), (3, 'C')])
+        data.teardown()
+    
+    @attr(functional=1)
+    def test_keys_are_read_back(self):
+        data = self.fixture.data(self.CategoryData)
+        data.setup()
+        
+        rs = self.engine.execute(
+                    categories.select().order_by(categories.c.id)).fetchall()
+        eq_([(r.id, r.name) for r in rs], 
+            [(10, 'existing')] + 
+            [(10 + i, 'Category %s' % i) for i in range(1, 6)])
+        eq_(data.CategoryData.category_1.id, 11)
+        eq_(data.CategoryData.category_5.id, 15)
+        
+        data.teardown()
+        rs = self.engine.execute(categories.select()).fetchall()
+        eq_([(r.id, r.name) for r in rs], [(10, 'existing')])
+
+class TestColumnarDataSet(ChunkedCategoryTest):
+    
+    def check_load(self, columns):
+        class CategoryData(ColumnarDataSet):
+            def data_columns(self):
+                return columns
+        data = self.fixture.data(CategoryData)
+        data.setup()
+        rs = self.engine.execute(
+                    categories.select().order_by(categories.c.id)).fetchall()
+        eq_([(r.id, r.name) for r in rs], 
+            [(i, 'Category %s' % i) for i in range(1, 6)])
+        eq_(data.CategoryData.row_2.name, 'Category 3')
+        eq_(data.CategoryData.row_2.id, 3)
+        data.teardown()
+        eq_(self.engine.execute(categories.select()).fetchall(), [])
+    
+    @attr(functional=1)
+    def test_columns_are_inserted(self):
+        self.check_load(dict(id=range(1, 6), 
+                             name=['Category %s' % i for i in range(1, 6)]))
+    
+    @attr(functional=1)
+    def test_keys_are_read_back(self):
+        self.check_load(dict(name=['Category %s' % i for i in range(1, 6)]))
+
+class TestStreamingDataSet(unittest.TestCase):
+    
+    def setUp(self):
+        self.engine = create_engine(conf.LITE_DSN)
+        metadata.bind = self.engine
+        metadata.create_all()
+    
+    def tearDown(self):
+        metadata.drop_all()
+    
+    @attr(functional=1)
+    def test_rows_are_generated_in_chunks(self):
+        generated = []
+        saved = []
+        class CategoryData(StreamingDataSet):
+            def data(self):
+                for key, values in category_rows():
+                    generated.append(key)
+                    yield (key, values)
+        class CountingMedium(TableMedium):
+            def save_many(self, rows):
+                saved.append((len(rows), len(generated)))
+                return TableMedium.save_many(self, rows)
+        fixture = SQLAlchemyFixture(
+            env={'CategoryData':categories}, engine=metadata.bind, 
+            medium=CountingMedium, chunk_size=2)
+        data = fixture.data(CategoryData)
+        data.setup()
+        eq_(saved, [(2, 2), (2, 4), (1, 5)])
+        
+        rs = self.engine.execute(
+                    categories.select().order_by(categories.c.id)).fetchall()
+        eq_([r.name for r in rs], ['Category %s' % i for i in range(1, 6)])
+        eq_(data.CategoryData.category_4.name, 'Category 4')
+        eq_(data.CategoryData.category_4.id, rs[3].id)
+        eq_(data.CategoryData.meta.keys, 
+            ['category_%s' % i for i in range(1, 6)])
+        
+        data.teardown()
+        eq_(self.engine.execute(categories.select()).fetchall(), [])
+
+    @attr(functional=1)
+    def test_rows_are_fetched_one_chunk_at_a_time(self):
+        class CategoryData(StreamingDataSet):
+            def data(self):
+                return category_rows()
+        fixture = SQLAlchemyFixture(
+            env={'CategoryData':categories}, engine=metadata.bind, 
+            chunk_size=2)
+        data = fixture.data(CategoryData)
+        data.setup()
+        eq_(data.CategoryData.category_4.name, 'Category 4')
+        stored = data.CategoryData.meta._stored_objects
+        fetched = [key for key in data.CategoryData.meta.keys 
+                            if stored.get_object(key).row is not None]
+        eq_(fetched, ['category_3', 'category_4'])
+        for key in data.CategoryData.meta.keys:
+            assert len(stored.get_object(key).batch.unfetched) <= 2
+        
+        data.teardown()
+    
+    @attr(functional=1)
+    def test_mapped_objects_are_not_kept(self):
+        clear_mappers()
+        setup_mappers()
+        kept = []
+        class CategoryData(StreamingDataSet):
+            def data(self):
+                return category_rows(range(1, 13))
+        class KeepingMedium(MappedClassMedium):
+            def save_many(self, rows):
+                stored = MappedClassMedium.save_many(self, rows)
+                kept.append((len(list(self.session)), len(self._added)))
+                return stored
+        fixture = SQLAlchemyFixture(
+            env={'CategoryData': Category}, engine=metadata.bind, 
+            medium=KeepingMedium, chunk_size=5)
+        try:
+            data = fixture.data(CategoryData)
+            data.setup()
+            # neither objects in the session nor added objects :
+            eq_(kept, [(0, 0), (0, 0), (0, 0)])
+            
+            rs = self.engine.execute(
+                    categories.select().order_by(categories.c.id)).fetchall()
+            eq_([r.name for r in rs], ['Category %s' % i for i in range(1, 13)])
+            eq_(data.CategoryData.category_12.name, 'Category 12')
+            eq_(data.CategoryData.category_12.id, rs[11].id)
+            
+            data.teardown()
+            eq_(self.engine.execute(categories.select()).fetchall(), [])
+        finally:
+            fixture.dispose()
+            clear_mappers()
+
+@attr(unit=1)
+def test_workers_need_threadsafe_connections():
+    engine = create_engine(conf.LITE_DSN)
+    # pysqlite connections can only be used in the thread that made them :
+    eq_(engine.dialect.dbapi.threadsafety < 2, True)
+    fixture = SQLAlchemyFixture(env={}, engine=engine, workers=4)
+    eq_(fixture.create_worker(), None)
+
+class TestParallelLoad(unittest.TestCase):
+    
+    def setUp(self):
+        if not conf.HEAVY_DSN:
+            raise SkipTest("conf.HEAVY_DSN not defined")
+        self.engine = create_engine(conf.HEAVY_DSN)
+        metadata.bind = self.engine
+        metadata.create_all()
+    
+    def tearDown(self):
+        metadata.drop_all()
+    
+    @attr(functional=1)
+    def test_independent_datasets_are_loaded_by_workers(self):
+        class CategoryData(DataSet):
+            class cars:
+                name = 'cars'
+        class AuthorData(DataSet):
+            class frank:
+                first_name = 'Frank'
+                last_name = 'Herbert'
+        class ProductData(DataSet):
+            class truck:
+                name = 'truck'
+                category_id = CategoryData.cars.ref('id')
+        class BookData(DataSet):
+            class dune:
+                title = 'Dune'
+                author_id = AuthorData.frank.ref('id')
+        fixture = SQLAlchemyFixture(
+            env={'CategoryData':categories, 'AuthorData':authors, 
+                 'ProductData':products, 'BookData':books}, 
+            engine=self.engine, workers=4)
+        data = fixture.data(ProductData, BookData)
+        data.setup()
+        try:
+            if self.engine.dialect.name == 'sqlite':
+                # connections to SQLite cannot be shared between threads
+                eq_(fixture.worker_pool, [])
+            else:
+                eq_(len(fixture.worker_pool), 2)
+            eq_(data.ProductData.truck.category_id, 
+                data.CategoryData.cars.id)
+            eq_(data.BookData.dune.author_id, data.AuthorData.frank.id)
+            rs = self.engine.execute(books.select()).fetchall()
+            eq_([r.title for r in rs], ['Dune'])
+        finally:
+            data.teardown()
+            fixture.dispose()
+        eq_(self.engine.execute(products.select()).fetchall(), [])
+        eq_(self.engine.execute(authors.select()).fetchall(), [])
+    
+    @attr(functional=1)
+    def test_rows_are_inserted_in_a_pipeline(self):
+        class CategoryData(DataSet):
+            def data(self):
+                return list(category_rows())
+        fixture = SQLAlchemyFixture(
+            env={'CategoryData':categories}, engine=self.engine, 
+            chunk_size=2, pipeline=2)
+        data = fixture.data(CategoryData)
+        data.setup()
+        try:
+            if self.engine.dialect.name == 'sqlite':
+                # connections to SQLite cannot be shared between threads
+                eq_(fixture.can_pipeline(), False)
+            rs = self.engine.execute(
+                    categories.select().order_by(categories.c.id)).fetchall()
+            eq_([r.name for r in rs], ['Category %s' % i for i in range(1, 6)])
+            eq_(data.CategoryData.category_5.id, rs[4].id)
+        finally:
+            data.teardown()
+            fixture.dispose()
+        eq_(self.engine.execute(categories.select()).fetchall(), [])
+
+class TestStatementCache(ChunkedCategoryTest):
+    
+    @attr(functional=1)
+    def test_statements_are_reused_across_cycles(self):
+        data = self.fixture.data(self.CategoryData)
+        data.setup()
+        eq_(data.CategoryData.category_5.name, 'Category 5')
+        data.teardown()
+        statements = dict(self.fixture.statements.statements)
+        assert len(statements), "expected cached statements"
+        
+        data = self.fixture.data(self.CategoryData)
+        data.setup()
+        eq_(data.CategoryData.category_5.name, 'Category 5')
+        data.teardown()
+        eq_(self.fixture.statements.statements, statements)
+        eq_(self.engine.execute(categories.select()).fetchall(), [])
+    
+    @attr(unit=1)
+    def test_statements_are_cached_per_signature(self):
+        statements = StatementCache()
+        insert = statements.insert(categories, None, ['name'])
+        assert statements.insert(categories, None, ['name']) is insert
+        assert statements.insert(categories, None, ['id', 'name']) is not insert
+        delete = statements.delete(categories, None, 2)
+        assert statements.delete(categories, None, 2) is delete
+        assert statements.delete(categories, None, 3) is not delete
+        eq_(len(statements), 4)
+
+class TestBulkMappings(unittest.TestCase):
+    
+    def datasets(self):
+        class CategoryData(DataSet):
+            class cars:
+                name = 'cars'
+            class free_stuff:
+                id = 7
+                name = 'get free stuff'
+        
+        class ProductData(DataSet):
+            class truck:
+                name = 'truck'
+                category = CategoryData.cars
+            class spaceship:
+                name = 'spaceship'
+                category = CategoryData.free_stuff
+        
+        class OfferData(DataSet):
+            class free_truck:
+                name = "it's a free truck"
+                product = ProductData.truck
+                category_id = CategoryData.free_stuff.ref('id')
+        
+        return CategoryData, ProductData, OfferData
+    
+    def setUp(self):
+        self.engine = create_engine(conf.LITE_DSN)
+        metadata.bind = self.engine
+        metadata.create_all()
+        self.session = get_transactional_session()()
+        self.fixture = SQLAlchemyFixture(
+            env={'CategoryData': Category, 'ProductData': Product, 
+                 'OfferData': Offer},
+            engine=metadata.bind,
+            bulk_mappings=True
+        )
+        clear_mappers()
+        mapper(Category, categories)
+        mapper(Product, products, properties={
+            'category': relation(Category, backref='products')
+        })
+        mapper(Offer, offers, properties={
+            'product': relation(Product, backref='offers'),
+        })
+    
+    def tearDown(self):
+        metadata.drop_all()
+        self.session.close()
+        clear_mappers()
+    
+    @attr(functional=1)
+    def test_setup_then_teardown(self):
+        CategoryData, ProductData, OfferData = self.datasets()
+        data = self.fixture.data(ProductData, OfferData)
+        data.setup()
+        clear_session(self.session)
+        
+        cats = self.session.query(Category).order_by('name').all()
+        eq_([(c.id, c.name) for c in cats], 
+            [(1, 'cars'), (7, 'get free stuff')])
+        prods = self.session.query(Product).order_by('name').all()
+        eq_([(p.name, p.category) for p in prods], 
+            [('spaceship', cats[1]), ('truck', cats[0])])
+        offer = self.session.query(Offer).one()
+        eq_(offer.product, prods[1])
+        eq_(offer.category_id, 7)
+        
+        eq_(data.ProductData.truck.id, prods[1].id)
+        eq_(data.OfferData.free_truck.category_id, 7)
+        
+        data.teardown()
+        clear_session(self.session)
+        eq_(self.session.query(Category).all(), [])
+        eq_(self.session.query(Product).all(), [])
+        eq_(self.session.query(Offer).all(), [])
+
+class TestMappedClassLoadScalesLinearly(unittest.TestCase):
+    
+    def setUp(self):
+        self.engine = create_engine(conf.LITE_DSN)
+        metadata.bind = self.engine
+        metadata.create_all()
+        clear_mappers()
+        mapper(Category, categories)
+    
+    def tearDown(self):
+        metadata.drop_all()
+        clear_mappers()
+    
+    def time_load(self, num_rows):
+        import time
+        class CategoryData(DataSet):
+            def data(self):
+                return list(category_rows(range(num_rows)))
+        # one row per save_many() call so that each row is checked against 
+        # the session :
+        fixture = SQLAlchemyFixture(
+            env={'CategoryData': Category}, engine=metadata.bind, 
+            chunk_size=1)
+        ds = CategoryData()
+        fixture.begin()
+        try:
+            started = time.time()
+            fixture.load_dataset(ds)
+            return time.time() - started
+        finally:
+            fixture.rollback()
+            fixture.dispose()
+    
+    @attr(functional=1, benchmark=1)
+    def test_loading_20k_rows(self):
+        small = self.time_load(5000)
+        large = self.time_load(20000)
+        # 4 times the rows should take about 4 times as long, a quadratic 
+        # load would take 16 times as long :
+        assert large < small * 8, (
+            "loading 20000 rows took %.2fs, 5000 rows took %.2fs" % (
+                                                            large, small))
+
+class TestTableObjectsWithCompositeKey(unittest.TestCase):
+    
+    def setUp(self):
+        self.engine = create_engine(conf.LITE_DSN)
+        self.meta = MetaData(bind=self.engine)
+        self.schedules = Table("fixture_sqlalchemy_schedule", self.meta,
+            Column("day", INT, primary_key=True),
+            Column("hour", INT, primary_key=True),
+            Column("event", String(100)))
+        self.meta.create_all()
+        self.engine.execute(self.schedules.insert(), day=1, hour=2, 
+                                                        event='existing')
+    
+    def tearDown(self):
+        self.meta.drop_all()
+    
+    @attr(functional=1)
+    def test_setup_then_teardown(self):
+        class ScheduleData(DataSet):
+            def data(self):
+                return [('event_%s_%s' % (day, hour), 
+                         dict(day=day, hour=hour, event='event')) 
+                            for day in range(1, 4) for hour in range(1, 4) 
+                                if (day, hour) != (1, 2)]
+        fixture = SQLAlchemyFixture(
+            env={'ScheduleData': self.schedules}, engine=self.engine)
+        data = fixture.data(ScheduleData)
+        data.setup()
+        eq_(len(self.engine.execute(self.schedules.select()).fetchall()), 9)
+        
+        data.teardown()
+        rs = self.engine.execute(self.schedules.select()).fetchall()
+        eq_([(r.day, r.hour, r.event) for r in rs], [(1, 2, 'existing')])
+    
+    @attr(functional=1)
+    def test_delete_many_in_chunks(self):
+        self.engine.execute(self.schedules.insert(), [
+                dict(day=2, hour=hour, event='event') for hour in range(5)])
+        delete_many(self.schedules, [[2, hour] for hour in range(5)], 
+                    chunk_size=2)
+        rs = self.engine.execute(self.schedules.select()).fetchall()
+        eq_([(r.day, r.hour, r.event) for r in rs], [(1, 2, 'existing')])
+    
+    @attr(functional=1)
+    def test_delete_many_binds_a_limited_number_of_values(self):
+        self.engine.execute(self.schedules.insert(), [
+                dict(day=2, hour=hour, event='event') for hour in range(600)])
+        statements = StatementCache()
+        delete_many(self.schedules, [[2, hour] for hour in range(600)], 
+                    statements=statements)
+        rs = self.engine.execute(self.schedules.select()).fetchall()
+        eq_([(r.day, r.hour, r.event) for r in rs], [(1, 2, 'existing')])
+        # two values per key :
+        eq_(sorted([key[-1] for key in statements.statements]), [101, 499])
+    
+    @attr(functional=1)
+    def test_loaded_rows_are_fetched_together(self):
+        fetched = []
+        class CountingBatch(LoadedRowBatch):
+            def fetch(self):
+                fetched.append(len(self.unfetched))
+                LoadedRowBatch.fetch(self)
+        self.engine.execute(self.schedules.insert(), [
+                dict(day=3, hour=hour, event='event %s' % hour) 
+                                                    for hour in range(5)])
+        batch = CountingBatch(self.schedules, chunk_size=2)
+        rows = [LoadedTableRow(self.schedules, [3, hour], None, batch=batch) 
+                                                    for hour in range(5)]
+        eq_([r.event for r in rows], ['event %s' % h for h in range(5)])
+        eq_(fetched, [5])
+        
+        missing = LoadedTableRow(self.schedules, [4, 1], None, batch=batch)
+        try:
+            missing.event
+        except LookupError:
+            pass
+        else:
+            raise AssertionError("expected LookupError for a missing row")
+        eq_(fetched, [5, 1])
+    
+    @attr(functional=1)
+    def test_loaded_rows_bind_a_limited_number_of_values(self):
+        self.engine.execute(self.schedules.insert(), [
+                dict(day=4, hour=hour, event='event') for hour in range(600)])
+        statements = StatementCache()
+        batch = LoadedRowBatch(self.schedules, statements=statements)
+        rows = [LoadedTableRow(self.schedules, [4, hour], None, batch=batch) 
+                                                    for hour in range(600)]
+        eq_([r.event for r in rows], ['event'] * 600)
+        # two values per key :
+        eq_(sorted([key[-1] for key in statements.statements]), [101, 499])
+
+class TestScopedSavepoints(unittest.TestCase):
+    class CategoryData(DataSet):
+        class cars:
+            name = 'cars'
+    
+    def setUp(self):
+        # pysqlite must not begin transactions itself for SAVEPOINT to work
+        self.engine = create_engine(
+                    conf.LITE_DSN, connect_args={'isolation_level': None})
+        metadata.bind = self.engine
+        metadata.create_all()
+        self.fixture = SQLAlchemyFixture(
+            env={'CategoryData':categories}, engine=self.engine)
+    
+    def tearDown(self):
+        self.fixture.dispose()
+        metadata.drop_all()
+    
+    @attr(functional=1)
+    def test_changes_are_rolled_back_to_loaded_data(self):
+        data = self.fixture.data(self.CategoryData)
+        data.setup_scope()
+        for name in ('trucks', 'boats'):
+            data.setup()
+            conn = self.fixture.connection
+            conn.execute(categories.insert(), name=name)
+            conn.execute(categories.update(), name='changed')
+            eq_([r.name for r in conn.execute(categories.select())], 
+                ['changed', 'changed'])
+            data.teardown()
+            rs = self.engine.execute(categories.select()).fetchall()
+            eq_([(r.id, r.name) for r in rs], 
+                [(data.CategoryData.cars.id, 'cars')])
+        data.teardown_scope()
+        eq_(self.engine.execute(categories.select()).fetchall(), [])
+    
+    @attr(functional=1)
+    def test_sqlite_must_not_begin_transactions(self):
+        engine = create_engine(conf.LITE_DSN)
+        metadata.bind = engine
+        metadata.create_all()
+        fixture = SQLAlchemyFixture(
+            env={'CategoryData':categories}, engine=engine)
+        data = fixture.data(self.CategoryData)
+        data.setup_scope()
+        try:
+            try:
+                data.setup()
+            except ValueError, e:
+                assert "isolation_level" in str(e), str(e)
+            else:
+                raise AssertionError("expected ValueError")
+        finally:
+            data.teardown_scope()
+            fixture.dispose()
+
+class TestRollbackTeardown(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = TempIO()
+        self.engine = create_engine('sqlite:///%s' % self.tmp.join('db.sqlite'))
+        metadata.bind = self.engine
+        metadata.create_all()
+        self.session = get_transactional_session()()
+        clear_mappers()
+        mapper(Category, categories)
+        mapper(Product, products, properties={
+            'category': relation(Category),
+        })
+    
+    def tearDown(self):
+        self.fixture.dispose()
+        metadata.drop_all()
+        self.session.close()
+        clear_mappers()
+        del self.tmp
+    
+    @attr(functional=1)
+    def test_data_is_never_committed(self):
+        import sqlite3
+        class NoUnload(object):
+            def unload_dataset(self, loader, dataset):
+                raise AssertionError("unexpected unload of %s" % dataset)
+        class CategoryData(DataSet):
+            class cars:
+                name = 'cars'
+        class ProductData(DataSet):
+            class truck:
+                name = 'truck'
+                category = CategoryData.cars
+        self.fixture = SQLAlchemyFixture(
+            env={'CategoryData': Category, 'ProductData': Product},
+            engine=self.engine, rollback_teardown=True, 
+            unload_strategy=NoUnload())
+        for i in range(2):
+            data = self.fixture.data(ProductData)
+            data.setup()
+            conn = self.fixture.connection
+            eq_([r.name for r in conn.execute(products.select())], ['truck'])
+            # the engine may share the connection, so look from another one :
+            other_conn = sqlite3.connect(self.tmp.join('db.sqlite'))
+            eq_(other_conn.execute("select * from %s" % products.name).fetchall(), [])
+            other_conn.close()
+            data.teardown()
+            eq_(conn.execute(products.select()).fetchall(), [])
+            eq_(conn.execute(categories.select()).fetchall(), [])
+
+class TestBackgroundSetup(unittest.TestCase):
+    
+    def setUp(self):
+        # an in-memory database would be another one in each thread :
+        self.tmp = TempIO()
+        self.engine = create_engine('sqlite:///%s' % self.tmp.join('db.sqlite'))
+        metadata.bind = self.engine
+        metadata.create_all()
+    
+    def tearDown(self):
+        metadata.drop_all()
+        del self.tmp
+    
+    @attr(functional=1)
+    def test_sqlite_data_is_used_outside_of_the_background_thread(self):
+        class CategoryData(DataSet):
+            class cars:
+                name = 'cars'
+        class ProductData(DataSet):
+            class truck:
+                name = 'truck'
+                category_id = CategoryData.cars.ref('id')
+        fixture = SQLAlchemyFixture(
+            env={'CategoryData': categories, 'ProductData': products}, 
+            engine=self.engine)
+        data = fixture.data(ProductData)
+        for i in range(2):
+            data.setup_in_background().wait()
+            rs = self.engine.execute(categories.select()).fetchall()
+            eq_([r.name for r in rs], ['cars'])
+            eq_(data.CategoryData.cars.id, rs[0].id)
+            eq_(data.ProductData.truck.category_id, rs[0].id)
+            # no row of ProductData was referenced while loading :
+            rs = self.engine.execute(products.select()).fetchall()
+            eq_(data.ProductData.truck.id, rs[0].id)
+            
+            data.teardown_in_background().wait()
+            eq_(self.engine.execute(products.select()).fetchall(), [])
+            eq_(self.engine.execute(categories.select()).fetchall(), [])
+        fixture.dispose()
+
+class TestSQLiteSnapshots(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = TempIO()
+    
+    def tearDown(self):
+        del self.tmp
+    
+    def check_snapshots(self, dsn):
+        engine = create_engine(dsn)
+        metadata.bind = engine
+        metadata.create_all()
+        saved = []
+        class CountingMedium(TableMedium):
+            def save_many(self, rows):
+                saved.append(self.dataset.__class__.__name__)
+                return TableMedium.save_many(self, rows)
+        class CategoryData(DataSet):
+            class cars:
+                name = 'cars'
+        class ProductData(DataSet):
+            class truck:
+                name = 'truck'
+                category_id = CategoryData.cars.ref('id')
+        fixture = SQLAlchemyFixture(
+            env={'CategoryData': categories, 'ProductData': products}, 
+            engine=engine, medium=CountingMedium, sqlite_snapshots=True)
+        try:
+            for i in range(3):
+                data = fixture.data(ProductData)
+                data.setup()
+                rs = engine.execute(products.select()).fetchall()
+                eq_([(r.name, r.category_id) for r in rs], 
+                    [('truck', data.CategoryData.cars.id)])
+                eq_(data.ProductData.truck.id, rs[0].id)
+                data.teardown()
+                eq_(engine.execute(products.select()).fetchall(), [])
+                eq_(engine.execute(categories.select()).fetchall(), [])
+            eq_(saved, ['CategoryData', 'ProductData'])
+        finally:
+            fixture.dispose()
+            metadata.drop_all()
+    
+    @attr(functional=1)
+    def test_file_database_is_copied(self):
+        self.check_snapshots('sqlite:///%s' % self.tmp.join('db.sqlite'))
+    
+    @attr(functional=1)
+    def test_memory_database_is_dumped(self):
+        self.check_snapshots('sqlite:///:memory:')
+    
+    def check_snapshot_dir(self, dsn):
+        engine = create_engine(dsn)
+        metadata.bind = engine
+        metadata.create_all()
+        saved = []
+        class CountingMedium(TableMedium):
+            def save_many(self, rows):
+                saved.append(self.dataset.__class__.__name__)
+                return TableMedium.save_many(self, rows)
+        def datasets(product_name):
+            class CategoryData(DataSet):
+                class cars:
+                    name = 'cars'
+            class ProductData(DataSet):
+                class truck:
+                    name = product_name
+                    category_id = CategoryData.cars.ref('id')
+            return ProductData
+        snapshot_dir = self.tmp.mkdir('snapshots')
+        try:
+            for name in ('truck', 'truck', 'pickup'):
+                # a new fixture, like in the next test run :
+                fixture = SQLAlchemyFixture(
+                    env={'CategoryData': categories, 'ProductData': products}, 
+                    engine=engine, medium=CountingMedium, 
+                    snapshot_dir=snapshot_dir)
+                data = fixture.data(datasets(name))
+                data.setup()
+                rs = engine.execute(products.select()).fetchall()
+                eq_([(r.name, r.category_id) for r in rs], 
+                    [(name, data.CategoryData.cars.id)])
+                eq_(data.ProductData.truck.id, rs[0].id)
+                data.teardown()
+                eq_(engine.execute(products.select()).fetchall(), [])
+                if not dsn.endswith(':memory:'):
+                    # otherwise the database would be gone
+                    fixture.dispose()
+            eq_(saved, ['CategoryData', 'ProductData', 
+                        'CategoryData', 'ProductData'])
+            eq_(len(os.listdir(snapshot_dir)), 4)
+        finally:
+            metadata.drop_all()
+    
+    @attr(functional=1)
+    def test_file_snapshots_are_kept_in_snapshot_dir(self):
+        self.check_snapshot_dir('sqlite:///%s' % self.tmp.join('db.sqlite'))
+    
+    @attr(functional=1)
+    def test_memory_snapshots_are_kept_in_snapshot_dir(self):
+        self.check_snapshot_dir('sqlite:///:memory:')
+    
+    @raises(ValueError)
+    @attr(unit=1)
+    def test_snapshots_require_an_engine(self):
+        SQLAlchemyFixture(session=get_transactional_session()(), 
+                          sqlite_snapshots=True)
+
+class TestTruncateStrategy(unittest.TestCase):
+    
+    def setUp(self):
+        self.engine = create_engine(conf.LITE_DSN)
+        metadata.bind = self.engine
+        metadata.create_all()
+        self.session = get_transactional_session()()
+        clear_mappers()
+        mapper(Product, products)
+    
+    def tearDown(self):
+        metadata.drop_all()
+        self.session.close()
+        clear_mappers()
+    
+    @attr(functional=1)
+    def test_setup_then_teardown(self):
+        from fixture.loadable import TruncateStrategy
+        class CategoryData(DataSet):
+            class cars:
+                name = 'cars'
+        class ProductData(DataSet):
+            class truck:
+                name = 'truck'
+                category_id = CategoryData.cars.ref('id')
+        fixture = SQLAlchemyFixture(
+            env={'CategoryData': categories, 'ProductData': Product}, 
+            engine=metadata.bind, unload_strategy=TruncateStrategy())
+        # not loaded by the fixture but it is still removed :
+        self.engine.execute(categories.insert(), id=10, name='existing')
+        
+        data = fixture.data(ProductData)
+        data.setup()
+        eq_(len(self.engine.execute(categories.select()).fetchall()), 2)
+        eq_(len(self.engine.execute(products.select()).fetchall()), 1)
+        
+        data.teardown()
+        eq_(self.engine.execute(categories.select()).fetchall(), [])
+        eq_(self.engine.execute(products.select()).fetchall(), [])
@@ -5,6 +5,7 @@ import sys
 import unittest
 import types
 import logging
+import threading
 
 __all__ = ['DataTestCase']
 
@@ -92,6 +93,45 @@ class ObjRegistry:
         self.registry[id] = object
         return id
 
+class ThreadLocalRegistry(object):
+    """An :class:`ObjRegistry` of its own for each thread.
+    
+    Lookups and changes go to the registry of the current thread, see 
+    :meth:`current`, which is created as an instance of registry_class when 
+    first used.  A thread doing part of the work of another thread, i.e. a 
+    worker loading data, shares the registry of that thread with 
+    :meth:`activate`.
+    """
+    def __init__(self, registry_class=ObjRegistry):
+        self.registry_class = registry_class
+        self.local = threading.local()
+    
+    def __repr__(self):
+        return "<%s for %s>" % (self.__class__.__name__, self.current())
+    
+    def __getattr__(self, name):
+        return getattr(self.current(), name)
+    
+    def __getitem__(self, obj):
+        return self.current()[obj]
+    
+    def __contains__(self, obj):
+        return obj in self.current()
+    
+    def activate(self, registry):
+        """use registry in the current thread and return the one used before"""
+        previous = self.current()
+        self.local.registry = registry
+        return previous
+    
+    def current(self):
+        """the registry of the current thread"""
+        try:
+            return self.local.registry
+        except AttributeError:
+            self.local.registry = self.registry_class()
+            return self.local.registry
+
 def with_debug(*channels, **kw):
     """
     A `nose`_ decorator calls :func:`start_debug` / :func:`start_debug` before and after the 